@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 
 # —— GPT & Generation Settings ——
@@ -29,21 +30,51 @@ PROMPTS_FILE = Path(__file__).parent / "query_gen_prompts.json"
 
 
 # ── Semantic Chunking
+CHUNK_MODE           = "semantic"                # "semantic" (embedding breakpoints) or "token" (tiktoken windows)
 PDF_MAX_CHUNK_TOKENS = 512
+CHUNK_MIN_TOKENS     = 32
 FIRST_CHUNK_ID       = 0
 MAX_ITEMS_PER_JSON   = 1000
+CHUNK_EMBED_BACKEND  = "local"                   # "local" (cached, offline) or "openai"
+CHUNK_EMBED_MODEL    = "BAAI/bge-small-en-v1.5"  # any key of MODEL_CONFIGS, for the "local" backend
+CHUNK_PREFETCH_FILES = 64                        # files whose sentences are embedded together
+CHUNK_WORKERS        = 1                         # >1 splits files in a process pool; ids stay the same
+CHUNK_TIKTOKEN_ENCODING = "cl100k_base"          # "token" mode only
+CHUNK_WINDOW_OVERLAP    = 0                      # tokens shared by consecutive windows, "token" mode only
 
 # ── MinHash Deduper 
 MINHASH_THRESHOLD = 0.8
 MINHASH_PERM      = 128
+MINHASH_HASH      = "sha1"               # "sha1": bit-identical to MinHash.update; "numpy": vectorized
+MINHASH_WORKERS   = os.cpu_count() or 1
+
+# ── Embedding Deduper
+EMBED_DEDUP_BACKEND   = "unisim"                  # "unisim" (TextSim) or "local" (embed_texts + usearch)
+EMBED_DEDUP_MODEL     = "BAAI/bge-small-en-v1.5"  # any key of MODEL_CONFIGS, for the "local" backend
+EMBED_DEDUP_K         = 10
+EMBED_DEDUP_THRESHOLD = MINHASH_THRESHOLD
+EMBED_DEDUP_THREADS   = 0                         # usearch threads; 0 → all cores
+EMBED_DEDUP_BLOCK     = 16384                     # chunk texts held in memory at once
 
 # ── PDF Downloader 
 MAX_PDFS_PER_KEYWORD = 20
 GOOGLE_PAUSE_SEC     = 5
 HTTP_429_SLEEP_MIN   = 60
+DOWNLOAD_CONCURRENCY = 16        # open connections in total
+DOWNLOAD_PER_HOST    = 4         # open connections per host
+DOWNLOAD_TIMEOUT_SEC = 30        # connect / between-reads timeout
+DOWNLOAD_MAX_MB      = 100       # larger PDFs are skipped
+DOWNLOAD_RETRIES     = 3         # attempts per URL, resuming partial files
+SEARCH_PROVIDER        = "google"  # "google" (live) or "local" (SEARCH_LOCAL_FILE, offline)
+SEARCH_RATE_PER_MIN    = 12        # live searches per minute, shared by all keywords
+SEARCH_CONCURRENCY     = 4         # live searches in flight
+SEARCH_TTL_DAYS        = 30        # reuse cached results this long
+SEARCH_EMPTY_TTL_HOURS = 24        # ...but retry empty results sooner
 
 # ── PDF Processor
-TABLES_EXTRACT = False
+TABLES_EXTRACT  = False
+PDF_WORKERS     = os.cpu_count() or 1   # 1 → extract serially in-process
+PDF_TIMEOUT_SEC = 300                   # per-file budget; 0 disables
 
 # ── Query Generators 
 # Adjust these lists to control sampling behavior
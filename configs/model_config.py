@@ -8,6 +8,22 @@ MODEL_CACHE_DIR = os.getenv("DISASTIR_MODEL_CACHE", str(Path.home() / ".cache" /
 DEFAULT_BATCH   = 32
 DEFAULT_MAXLEN  = 256
 DEFAULT_TOPK    = 10  
+CORPUS_SHARD_ROWS = 65536           # corpus embeddings are saved (and resumed) per shard
+EMBED_TOKEN_BUDGET = 16384          # corpus batches: padded tokens per batch, by length (0 = DEFAULT_BATCH in order)
+EMBED_ADAPTIVE    = True            # corpus batches: halve on OOM, isolate unembeddable passages
+EMBED_GROW_AFTER  = 20              # clean batches before an adaptive limit doubles again
+EMBED_MAX_SCALE   = 4               # adaptive limit never exceeds this × the configured batch/budget
+EMBED_PREFETCH    = 2               # batches tokenized ahead by a thread pool while the model runs (0 = inline)
+
+# Exact search: corpus block size, blocks in flight (matmuls are multi-threaded by torch)
+EXACT_BLOCK_MB   = 256
+EXACT_THREADS    = 2
+
+# ANN (usearch HNSW): threads for graph build and query, rows per add / checkpoint
+ANN_BUILD_THREADS  = os.cpu_count() or 1
+ANN_SEARCH_THREADS = os.cpu_count() or 1
+ANN_ADD_BATCH      = 250_000
+ANN_CACHE_MB       = 8192           # memory-mapped indexes kept open (LRU); at least one
 
 # Pooling strategy or encoding flag for each model
 MODEL_CONFIGS = {
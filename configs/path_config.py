@@ -20,6 +20,10 @@ CHUNK_JSON_ROOT     = BASE_DIR / "chunks_json"
 # ─── Intermediate & Cache 
 EMBED_DEDUP_ROOT    = BASE_DIR / "chunks_deduped"
 SEARCH_CACHE_DIR    = BASE_DIR / "search_cache"
+SEARCH_LOCAL_FILE   = BASE_DIR / "search_results.json"
+SENTENCE_CACHE_DIR  = BASE_DIR / "sentence_cache"
+MANIFEST_PATH       = BASE_DIR / "corpus_manifest.json"
+MINHASH_INDEX_DIR   = BASE_DIR / "minhash_index"
 
 # ─── Final Outputs
 OUTPUT_QRELS_DIR    = BASE_DIR / "qrels"
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# scripts/bench_ann.py
+
+import argparse
+import os
+import tempfile
+import time
+from pathlib import Path
+
+import sys
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import numpy as np
+
+from configs.model_config import DEFAULT_TOPK, ANN_ADD_BATCH
+from src.retrieval.index_builder import IndexBuilder
+from src.retrieval.retriever import Retriever
+
+
+def unit_vectors(n: int, dim: int, seed: int) -> np.ndarray:
+    embs = np.random.default_rng(seed).standard_normal((n, dim), dtype=np.float32)
+    embs /= np.linalg.norm(embs, axis=1, keepdims=True)
+    return embs
+
+
+def thread_counts(max_threads: int) -> list[int]:
+    counts, t = [], 1
+    while t < max_threads:
+        counts.append(t)
+        t *= 2
+    return counts + [max_threads]
+
+
+def main(n: int, dim: int, queries: int, k: int, max_threads: int, embs_path: Path | None):
+    embs = np.load(embs_path, mmap_mode="r") if embs_path else unit_vectors(n, dim, seed=0)
+    q = unit_vectors(queries, embs.shape[1], seed=1)
+    print(f"{len(embs):,d} vectors × {embs.shape[1]} dims, {queries} queries, top-{k}")
+    print(f"{'threads':>7} {'build rows/s':>13} {'build s':>8} {'queries/s':>10} {'speedup':>8}")
+
+    base = None
+    with tempfile.TemporaryDirectory() as tmp:
+        for threads in thread_counts(max_threads):
+            ib = IndexBuilder(cache_dir=tmp, device="cpu", threads=threads, add_batch=ANN_ADD_BATCH)
+            t0 = time.perf_counter()
+            idx = ib.ann_index(f"bench_{threads}", embs, rebuild=True)
+            t_build = time.perf_counter() - t0
+
+            r = Retriever([], {"bench": embs}, {"bench": idx}, top_k=k, device="cpu", ann_threads=threads)
+            t0 = time.perf_counter()
+            r._ann_ids("bench", q)
+            t_search = time.perf_counter() - t0
+
+            base = base or t_build
+            print(f"{threads:7d} {len(embs) / t_build:13.0f} {t_build:8.1f} "
+                  f"{queries / t_search:10.0f} {base / t_build:7.1f}x")
+            del idx, r
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark usearch HNSW build and query throughput against the thread count."
+    )
+    parser.add_argument("--vectors",     type=int,  default=500_000)
+    parser.add_argument("--dim",         type=int,  default=768)
+    parser.add_argument("--queries",     type=int,  default=10_000)
+    parser.add_argument("--k",           type=int,  default=DEFAULT_TOPK)
+    parser.add_argument("--max_threads", type=int,  default=os.cpu_count() or 1)
+    parser.add_argument("--embs",        type=Path, default=None,
+                        help="Real corpus embeddings (.npy) instead of random vectors")
+    args = parser.parse_args()
+    main(args.vectors, args.dim, args.queries, args.k, args.max_threads, args.embs)
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+# scripts/bench_chunking.py
+
+import argparse
+import random
+import time
+from pathlib import Path
+
+import sys
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from configs.gen_config import CHUNK_EMBED_BACKEND, CHUNK_MIN_TOKENS, PDF_MAX_CHUNK_TOKENS
+from src.corpus.chunker import Chunker
+from src.corpus.token_chunker import TokenWindowChunker
+
+WORDS = (
+    "flood evacuation shelter hurricane levee bridge collapse chemical spill "
+    "response agency planning wildfire drought earthquake tsunami warning "
+    "recovery funding infrastructure hazard mitigation community resilience"
+).split()
+
+
+def synthetic_doc(rng: random.Random, sentences: int) -> str:
+    return " ".join(
+        " ".join(rng.choice(WORDS) for _ in range(rng.randint(6, 30))).capitalize() + rng.choice(".?!")
+        for _ in range(sentences)
+    )
+
+
+def bench(name: str, splitter, docs: list[str]) -> float:
+    t0 = time.perf_counter()
+    chunks = sum(len(splitter.create_documents([d])) for d in docs)
+    dt = time.perf_counter() - t0
+    rate = len(docs) / dt
+    print(f"{name:9} {rate:10.1f} docs/s  {rate * 3600:14,.0f} docs/h  {chunks / len(docs):6.1f} chunks/doc")
+    return rate
+
+
+def main(docs: int, sentences: int, semantic_docs: int):
+    rng = random.Random(0)
+    texts = [synthetic_doc(rng, sentences) for _ in range(docs)]
+    print(f"{docs} synthetic docs × {sentences} sentences, "
+          f"windows of {CHUNK_MIN_TOKENS}-{PDF_MAX_CHUNK_TOKENS} tokens")
+
+    token = bench("token", TokenWindowChunker(), texts)
+    if semantic_docs:
+        splitter = Chunker(mode="semantic", embed_backend=CHUNK_EMBED_BACKEND).splitter
+        semantic = bench("semantic", splitter, texts[:semantic_docs])
+        print(f"token mode is x{token / semantic:.1f} faster")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark token-window chunking against the semantic chunker."
+    )
+    parser.add_argument("--docs",          type=int, default=2000)
+    parser.add_argument("--sentences",     type=int, default=200)
+    parser.add_argument("--semantic_docs", type=int, default=50,
+                        help="Docs for the semantic path (it embeds every sentence); 0 to skip")
+    args = parser.parse_args()
+    main(args.docs, args.sentences, args.semantic_docs)
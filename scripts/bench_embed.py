@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# scripts/bench_embed.py
+
+import argparse
+import time
+from pathlib import Path
+
+import sys
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import numpy as np
+import torch
+from transformers import AutoTokenizer, AutoModel
+
+from configs.path_config import EMBED_DEDUP_ROOT
+from configs.model_config import (
+    MODEL_CONFIGS,
+    MODEL_CACHE_DIR,
+    DEFAULT_BATCH,
+    DEFAULT_MAXLEN,
+    EMBED_TOKEN_BUDGET,
+    EMBED_PREFETCH,
+    DEVICE,
+    DTYPE,
+)
+from src.corpus.manager import CorpusManager
+from src.utils.embed import embed_texts, length_batches, EmbedTimer
+
+
+def padded_tokens(lengths: np.ndarray, batches: list[np.ndarray]) -> int:
+    return sum(len(b) * int(lengths[b].max()) for b in batches)
+
+
+def main(model_name: str, n: int, batch: int, token_budget: int, prefetch: int, max_len: int, seed: int):
+    corpus = CorpusManager(EMBED_DEDUP_ROOT).load()
+    ids = np.sort(np.random.default_rng(seed).choice(len(corpus), size=min(n, len(corpus)), replace=False))
+    texts = corpus.take(ids)
+
+    tok = AutoTokenizer.from_pretrained(model_name, trust_remote_code=True, cache_dir=MODEL_CACHE_DIR)
+    mdl = AutoModel.from_pretrained(
+        model_name, trust_remote_code=True, cache_dir=MODEL_CACHE_DIR
+    ).to(DEVICE).eval()
+    cfg = MODEL_CONFIGS.get(model_name, {})
+
+    lengths = np.fromiter(
+        map(len, tok(texts, max_length=max_len, truncation=True)["input_ids"]), dtype=np.int64, count=len(texts)
+    )
+    real = int(lengths.sum())
+    print(f"{len(texts)} passages sampled from {len(corpus):,d}; tokens/passage "
+          f"p50 {np.percentile(lengths, 50):.0f}  p90 {np.percentile(lengths, 90):.0f}  max {lengths.max()}")
+    fixed = [np.arange(i, min(i + batch, len(texts))) for i in range(0, len(texts), batch)]
+    plans = {
+        f"fixed batch {batch}":          (dict(batch_size=batch), fixed),
+        f"token budget {token_budget}":  (dict(batch_size=batch, token_budget=token_budget),
+                                          length_batches(lengths, token_budget)),
+    }
+    if prefetch:
+        plans[f"+ prefetch {prefetch}"] = (dict(batch_size=batch, token_budget=token_budget, prefetch=prefetch),
+                                           plans[f"token budget {token_budget}"][1])
+
+    print(f"{'mode':<22} {'batches':>8} {'padding':>8} {'wall s':>8} {'tokens/s':>10}")
+    ref = None
+    for name, (kw, batches) in plans.items():
+        if DEVICE == "cuda":
+            torch.cuda.synchronize()
+        timer = EmbedTimer()
+        t0 = time.perf_counter()
+        embs, valid = embed_texts(
+            mdl, tok, texts,
+            max_len=max_len,
+            pool_tag=cfg.get("pool", "cls"),
+            device=DEVICE,
+            dtype=DTYPE,
+            use_encode=cfg.get("use_encode", False),
+            desc=name,
+            stats=timer,
+            **kw,
+        )
+        if DEVICE == "cuda":
+            torch.cuda.synchronize()
+        wall = time.perf_counter() - t0
+        pad = 1 - real / padded_tokens(lengths, batches)
+        print(f"{name:<22} {len(batches):8d} {pad:8.1%} {wall:8.1f} {real / wall:10.0f}")
+        print(f"{'':<22} {timer.summary()}")
+        if ref is None:
+            ref = (embs, valid)
+        elif valid == ref[1]:
+            print(f"{'':<22} max |Δ| vs fixed order {np.abs(embs - ref[0]).max():.2e}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark fixed-size vs length-bucketed token-budget batching (and tokenization prefetch) on real passages."
+    )
+    parser.add_argument("--model",        default="BAAI/bge-small-en-v1.5")
+    parser.add_argument("--passages",     type=int, default=20_000)
+    parser.add_argument("--batch",        type=int, default=DEFAULT_BATCH)
+    parser.add_argument("--token_budget", type=int, default=EMBED_TOKEN_BUDGET)
+    parser.add_argument("--prefetch",     type=int, default=EMBED_PREFETCH,
+                        help="Also time token-budget batching with this many batches tokenized ahead (0 = skip)")
+    parser.add_argument("--max_len",      type=int, default=DEFAULT_MAXLEN)
+    parser.add_argument("--seed",         type=int, default=0)
+    args = parser.parse_args()
+    main(args.model, args.passages, args.batch, args.token_budget, args.prefetch, args.max_len, args.seed)
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+# scripts/bench_embed_dedup.py
+
+import argparse
+import resource
+import time
+from pathlib import Path
+
+import sys
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import numpy as np
+
+from configs.gen_config import EMBED_DEDUP_K, EMBED_DEDUP_THREADS, EMBED_DEDUP_THRESHOLD
+from src.corpus.dedup_backends import LocalEmbedBackend
+from src.corpus.deduper import _components
+
+
+def peak_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def synthetic(n: int, dim: int, dup_frac: float, seed: int = 0) -> tuple[np.ndarray, int]:
+    """
+    n unit vectors where a `dup_frac` share are slightly perturbed copies
+    of earlier rows (planted near-duplicates).
+    """
+    rng = np.random.default_rng(seed)
+    embs = rng.standard_normal((n, dim), dtype=np.float32)
+    n_dup = int(n * dup_frac)
+    dup = rng.choice(np.arange(1, n), size=n_dup, replace=False)
+    src = (rng.random(n_dup) * dup).astype(np.int64)
+    embs[dup] = embs[src] + 0.05 * rng.standard_normal((n_dup, dim), dtype=np.float32)
+    embs /= np.linalg.norm(embs, axis=1, keepdims=True)
+    return embs, n_dup
+
+
+def main(n: int, dim: int, k: int, threads: int, dup_frac: float):
+    embs, n_dup = synthetic(n, dim, dup_frac)
+    print(f"{n} synthetic chunks × {dim} dims, {n_dup} planted near-duplicates")
+    print(f"after generation            peak RSS {peak_rss_mb():9.1f} MB")
+
+    backend = LocalEmbedBackend(k=k, threads=threads)
+    t0 = time.perf_counter()
+    ids, sims = backend.knn(embs)
+    t_knn = time.perf_counter() - t0
+    print(f"usearch kNN (k={k:<3}) {n / t_knn:12.0f} chunks/s  {t_knn:7.1f}s  peak RSS {peak_rss_mb():9.1f} MB")
+
+    t0 = time.perf_counter()
+    labels = _components(ids, sims, EMBED_DEDUP_THRESHOLD)
+    kept = len(np.unique(labels))
+    t_cc = time.perf_counter() - t0
+    print(f"connected components  {n / t_cc:12.0f} chunks/s  {t_cc:7.1f}s  peak RSS {peak_rss_mb():9.1f} MB")
+    print(f"kept {kept} of {n} (expected ≈ {n - n_dup})  total {n / (t_knn + t_cc):.0f} chunks/s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark the local embedding dedup backend (usearch kNN + connected components)."
+    )
+    parser.add_argument("--chunks",   type=int,   default=1_000_000)
+    parser.add_argument("--dim",      type=int,   default=384)
+    parser.add_argument("--k",        type=int,   default=EMBED_DEDUP_K)
+    parser.add_argument("--threads",  type=int,   default=EMBED_DEDUP_THREADS)
+    parser.add_argument("--dup_frac", type=float, default=0.1)
+    args = parser.parse_args()
+    main(args.chunks, args.dim, args.k, args.threads, args.dup_frac)
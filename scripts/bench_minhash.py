@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+# scripts/bench_minhash.py
+
+import argparse
+import os
+import random
+import tempfile
+import time
+from pathlib import Path
+
+import sys
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import numpy as np
+from datasketch import MinHash
+
+from configs.gen_config import MINHASH_PERM
+from src.corpus.minhash import SignatureEngine
+
+WORDS = (
+    "flood evacuation shelter hurricane levee bridge collapse chemical spill "
+    "response agency planning wildfire drought earthquake tsunami warning "
+    "recovery funding infrastructure hazard mitigation community resilience"
+).split()
+
+
+def legacy_minhash(tok, txt: str) -> MinHash:
+    """
+    The pre-engine MinHashDeduper._text2_minhash: one update per trigram.
+    """
+    mh = MinHash(num_perm=MINHASH_PERM)
+    ids = tok.encode(txt, add_special_tokens=False)
+    for i in range(len(ids) - 2):
+        mh.update(str(tuple(ids[i:i+3])).encode())
+    return mh
+
+
+def main(docs: int, words: int, workers: int):
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = []
+        for i in range(docs):
+            fp = Path(tmp) / f"doc_{i}.txt"
+            fp.write_text(" ".join(rng.choice(WORDS) for _ in range(words)), encoding="utf-8")
+            paths.append(fp)
+        print(f"{docs} synthetic docs × {words} words")
+
+        engine = SignatureEngine(hash_mode="sha1", workers=1)
+        t0 = time.perf_counter()
+        legacy = np.stack([
+            legacy_minhash(engine.tok, p.read_text(encoding="utf-8")).hashvalues for p in paths
+        ])
+        t_legacy = time.perf_counter() - t0
+        print(f"legacy per-gram update      {docs / t_legacy:9.1f} docs/s")
+
+        for mode in ("sha1", "numpy"):
+            for w in sorted({1, workers}):
+                engine = SignatureEngine(hash_mode=mode, workers=w)
+                t0 = time.perf_counter()
+                sigs = engine.from_files(paths)
+                dt = time.perf_counter() - t0
+                note = ""
+                if mode == "sha1":
+                    note = "bit-identical" if np.array_equal(sigs, legacy) else "MISMATCH"
+                print(f"engine {mode:5} workers={w:<3}  {docs / dt:9.1f} docs/s  x{t_legacy / dt:6.1f}  {note}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark MinHash signatures: legacy per-gram loop vs SignatureEngine."
+    )
+    parser.add_argument("--docs",    type=int, default=500)
+    parser.add_argument("--words",   type=int, default=5000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+    main(args.docs, args.words, args.workers)
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# scripts/bench_pdf_extract.py
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import sys
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import fitz
+
+from src.corpus.processor import PDFProcessor
+
+
+def make_pdf(path: Path, pages: int, blocks: int, table_every: int) -> None:
+    """
+    Write a synthetic report: `blocks` paragraphs per page, a page number
+    in the footer, and a ruled 4x3 table on every `table_every`-th page.
+    """
+    doc = fitz.open()
+    for p in range(pages):
+        page = doc.new_page()
+        for b in range(blocks):
+            page.insert_text(
+                (72, 60 + b * 18),
+                f"Section {p}.{b}: evacuation routes and shelter capacity for the flood season",
+                fontsize=8,
+            )
+        if table_every and p % table_every == 0:
+            for r in range(4):
+                for c in range(3):
+                    cell = fitz.Rect(72 + 150 * c, 500 + 24 * r, 222 + 150 * c, 524 + 24 * r)
+                    page.draw_rect(cell)
+                    page.insert_text((cell.x0 + 4, cell.y1 - 8), f"r{r}c{c}", fontsize=8)
+        page.insert_text((300, page.rect.height - 20), str(p + 1), fontsize=8)
+    doc.save(path)
+    doc.close()
+
+
+def legacy_extract(pdf_path: Path, table_extract: bool) -> str:
+    """
+    The pre-rewrite extraction loop: string += and all-pairs overlap test,
+    find_tables on every page.
+    """
+    doc = fitz.open(pdf_path)
+    full_text = ""
+    for page in doc:
+        blocks = page.get_text("blocks")
+        tables = page.find_tables() if table_extract else []
+        for b in blocks:
+            bbox, txt = b[:4], b[4]
+            if bbox[1] > page.rect.height * 0.9 or bbox[3] < page.rect.height * 0.1:
+                if txt.strip().isdigit():
+                    continue
+            if any(fitz.Rect(bbox).intersects(t.bbox) for t in tables):
+                continue
+            full_text += txt + "\n"
+        if table_extract:
+            for tb in tables:
+                tb.extract()
+    doc.close()
+    return full_text
+
+
+def main(pages: int, blocks: int, table_every: int, repeat: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        pdf = tmp / "report.pdf"
+        make_pdf(pdf, pages, blocks, table_every)
+        print(f"synthetic PDF: {pages} pages, {blocks} blocks/page, table every {table_every} pages")
+
+        for tables in (False, True):
+            proc = PDFProcessor(table_extract=tables, txt_root=tmp, workers=1)
+            t_old = t_new = float("inf")
+            for _ in range(repeat):
+                t0 = time.perf_counter()
+                old = legacy_extract(pdf, tables)
+                t_old = min(t_old, time.perf_counter() - t0)
+
+                t0 = time.perf_counter()
+                new, _ = proc._extract_pdf_content(pdf, tmp / "report.csv")
+                t_new = min(t_new, time.perf_counter() - t0)
+
+            assert old == new, "extracted text differs from legacy path"
+            print(
+                f"TABLES_EXTRACT={tables!s:5}  legacy {t_old:7.3f}s  "
+                f"new {t_new:7.3f}s  speedup x{t_old / t_new:.2f}"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Micro-benchmark PDFProcessor._extract_pdf_content against the legacy loop."
+    )
+    parser.add_argument("--pages",       type=int, default=500)
+    parser.add_argument("--blocks",      type=int, default=30)
+    parser.add_argument("--table_every", type=int, default=20)
+    parser.add_argument("--repeat",      type=int, default=3)
+    args = parser.parse_args()
+    main(args.pages, args.blocks, args.table_every, args.repeat)
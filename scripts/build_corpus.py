@@ -11,30 +11,32 @@ from src.corpus.downloader import PDFDownloader
 from src.corpus.processor  import PDFProcessor, Cleaner
 from src.corpus.deduper    import MinHashDeduper, EmbeddingDeduper
 from src.corpus.chunker    import Chunker
+from src.corpus.manifest   import Manifest
 
 
-def main(keywords_json: Path):
+def main(keywords_json: Path, full_rebuild: bool = False):
     """
     Complete corpus construction pipeline:
     1. Download PDFs by keywords
-    2. Extract text (and tables if enabled)
-    3. Clean extracted text
-    4. MinHash-based deduplication
-    5. Semantic chunking
-    6. Embedding-based deduplication
+    2. Extract text (and tables if enabled), cleaned in the same pass
+    3. MinHash-based deduplication
+    4. Semantic chunking
+    5. Embedding-based deduplication
+
+    Stages consult a content-hash manifest, so a rerun only processes
+    new or changed PDFs; `full_rebuild` starts from an empty manifest.
     """
+    manifest = Manifest(fresh=full_rebuild)
    
     PDFDownloader().run(keywords_json)
 
-    PDFProcessor().run()
-
-    Cleaner().run()
+    PDFProcessor(cleaner=Cleaner(), manifest=manifest).run()
 
-    MinHashDeduper().run()
+    MinHashDeduper(manifest=manifest).run()
 
-    Chunker().run()
+    Chunker(manifest=manifest).run()
 
-    EmbeddingDeduper().run()
+    EmbeddingDeduper(manifest=manifest).run()
 
     print("Corpus build completed!")
 
@@ -49,5 +51,10 @@ if __name__ == "__main__":
         required=True,
         help="This json is in Disaster_IR/configs/disaster_type.json"
     )
+    parser.add_argument(
+        "--full_rebuild",
+        action="store_true",
+        help="Ignore the corpus manifest and reprocess every stage from scratch"
+    )
     args = parser.parse_args()
-    main(args.keywords_json)
+    main(args.keywords_json, args.full_rebuild)
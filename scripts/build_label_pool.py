@@ -3,6 +3,7 @@
 
 import sys
 import glob
+import argparse
 from pathlib import Path
 
 import torch
@@ -11,7 +12,7 @@ sys.path.append(str(Path(__file__).resolve().parent.parent))
 
 
 from configs.path_config import (
-    CORPUS_DIR,
+    EMBED_DEDUP_ROOT,
     TEST_QUERY_DIR,
     QUERY_EMB_DIR,
     BASELINE_INDEX_DIR,
@@ -25,14 +26,12 @@ from src.retrieval.retriever        import Retriever
 from src.retrieval.label_pool_builder import LabelPoolBuilder
 
 
-def main():
+def main(export_text: bool = False):
     # 1. choose device
     device = "cuda" if torch.cuda.is_available() else "cpu"
 
-    # 2. load or build ordered corpus
-    oc_json = Path(CORPUS_DIR) / "ordered_corpus.json"
-    cm = CorpusManager(CORPUS_DIR, str(oc_json))
-    corpus = cm.load() if oc_json.exists() else cm.build()
+    # 2. open (or build) the memory-mapped passage store
+    corpus = CorpusManager(EMBED_DEDUP_ROOT).load()
 
     # 3. generate or load query embeddings
     qe = QueryEmbedder(
@@ -45,18 +44,18 @@ def main():
     )
     qe.run()
 
-    # 4. build corpus embeddings + ANN indexes
+    # 4. build per-model corpus embeddings + ANN indexes
     ib = IndexBuilder(
         cache_dir=BASELINE_INDEX_DIR,
         device=device,
         dtype=torch.float32,
     )
-    corpus_emb, ann_idxs = ib.build_all(corpus)
+    corpus_embs, ann_idxs = ib.build_all(corpus)
 
     # 5. instantiate retriever
     retriever = Retriever(
         corpus=corpus,
-        corpus_emb=corpus_emb,
+        corpus_embs=corpus_embs,
         ann_idxs=ann_idxs,
         top_k=DEFAULT_TOPK,
         device=device,
@@ -68,14 +67,27 @@ def main():
         query_emb_dir=QUERY_EMB_DIR,
     )
 
-    for q_json in glob.glob(str(Path(TEST_QUERY_DIR) / "*.json")):
-        for model_name, cfg in MODEL_CONFIGS.items():
-            
+    # one model at a time, so only its index is mapped
+    q_jsons = sorted(glob.glob(str(Path(TEST_QUERY_DIR) / "*.json")))
+    for model_name, cfg in MODEL_CONFIGS.items():
+        for q_json in q_jsons:
             print(f"Building label pool for {Path(q_json).stem} with {model_name}")
             lpb.build_for_file(q_json, model_name, retriever)
+        ann_idxs.evict(model_name)
 
     print("Label pool construction completed!")
 
+    # 7. optional all-text view of the id pools
+    if export_text:
+        for pool_json in sorted(Path(LABEL_POOL_DIR).glob("*_label_pool.json")):
+            lpb.export_text(str(pool_json), corpus, str(Path(LABEL_POOL_DIR) / "text" / pool_json.name))
+
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--export_text", action="store_true",
+        help="Also write label pools with passage text under label_pools/text/"
+    )
+    args = parser.parse_args()
+    main(export_text=args.export_text)
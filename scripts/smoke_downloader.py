@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+# scripts/smoke_downloader.py
+
+import asyncio
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import urlsplit
+
+import sys
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from src.corpus.downloader import PDFDownloader
+from src.corpus.fetcher import AsyncFetcher
+from src.corpus.search_providers import CachedSearch, LocalFileProvider
+
+PDF   = b"%PDF-1.4\n" + os.urandom(300_000)
+PDF2  = b"%PDF-1.7\n" + os.urandom(200_000)
+BODY  = {"/ok.pdf": PDF, "/copy.pdf": PDF, "/flaky.pdf": PDF2}
+CAP   = 1 << 20
+SEEN  = []      # (path, Range header) per request
+FLAKY = {"n": 0}
+
+
+class StandIn(BaseHTTPRequestHandler):
+    """
+    Local stand-in for PDF hosts:
+      /ok.pdf      a PDF, honours Range
+      /flaky.pdf   another PDF whose first response is cut off halfway
+      /copy.pdf    the same bytes as /ok.pdf under another URL
+      /html.pdf    an HTML page
+      /big.pdf     Content-Length above the cap
+      /gone.pdf    404
+    """
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        rng = self.headers.get("Range")
+        self.path = urlsplit(self.path).path
+        SEEN.append((self.path, rng))
+        if self.path == "/html.pdf":
+            return self._send(200, b"<html>not a pdf</html>")
+        if self.path == "/big.pdf":
+            self.send_response(200)
+            self.send_header("Content-Length", str(CAP + 1))
+            self.end_headers()
+            return
+        if self.path not in BODY:
+            return self._send(404, b"")
+
+        full = BODY[self.path]
+        start = int(rng[len("bytes="):-1]) if rng else 0
+        if start >= len(full):
+            self.send_response(416)
+            self.send_header("Content-Range", f"bytes */{len(full)}")
+            self.end_headers()
+            return
+        body = full[start:]
+        self.send_response(206 if rng else 200)
+        if rng:
+            self.send_header("Content-Range", f"bytes {start}-{len(full) - 1}/{len(full)}")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if self.path == "/flaky.pdf" and FLAKY["n"] == 0:
+            FLAKY["n"] += 1
+            self.wfile.write(body[:len(body) // 2])
+            self.wfile.flush()
+            self.connection.shutdown(2)
+            return
+        self.wfile.write(body)
+
+    def _send(self, status: int, body: bytes):
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def check(name: str, cond: bool):
+    print(f"{'ok  ' if cond else 'FAIL'} {name}")
+    if not cond:
+        check.failed = True
+
+
+async def fetcher_checks(base: str, tmp: Path):
+    async with AsyncFetcher(max_bytes=CAP, retries=3) as f:
+        part = tmp / "ok.part"
+        check("plain download", await f.fetch(f"{base}/ok.pdf", part) == hashlib.sha256(PDF).hexdigest()
+          and part.read_bytes() == PDF)
+
+        part = tmp / "resume.part"
+        part.write_bytes(PDF[:1000])
+        SEEN.clear()
+        digest = await f.fetch(f"{base}/ok.pdf", part)
+        check("resume partial file with Range", digest == hashlib.sha256(PDF).hexdigest()
+              and part.read_bytes() == PDF and SEEN == [("/ok.pdf", "bytes=1000-")])
+
+        part = tmp / "complete.part"
+        part.write_bytes(PDF)
+        check("complete part answered with 416", await f.fetch(f"{base}/ok.pdf", part) and part.read_bytes() == PDF)
+
+        part = tmp / "flaky.part"
+        SEEN.clear()
+        ok = await f.fetch(f"{base}/flaky.pdf", part)
+        check("cut-off transfer resumed on retry",
+              ok and part.read_bytes() == PDF2 and SEEN[1][1] == f"bytes={len(PDF2) // 2}-")
+
+        for name in ("html", "big", "gone"):
+            part = tmp / f"{name}.part"
+            check(f"{name}.pdf rejected", not await f.fetch(f"{base}/{name}.pdf", part) and not part.exists())
+
+
+class CountingProvider(LocalFileProvider):
+    calls = 0
+
+    def search(self, keyword: str) -> list[str]:
+        CountingProvider.calls += 1
+        return super().search(keyword)
+
+
+def downloader_checks(base: str, tmp: Path):
+    urls = [f"{base}/{n}.pdf" for n in ("ok", "html", "big", "gone", "flaky")]
+    FLAKY["n"] = 0
+    kw_json = tmp / "keywords.json"
+    kw_json.write_text(json.dumps(["Flood", "Wildfire", "Storm"]))
+    results = tmp / "search_results.json"
+    results.write_text(json.dumps({
+        "Flood":    urls,
+        "Wildfire": [f"{base}/ok.pdf?utm_source=x#page=2"],     # same URL, normalized
+        "Storm":    [f"{base}/copy.pdf"],                       # same bytes, other URL
+    }))
+
+    def make():
+        searcher = CachedSearch(CountingProvider(results), cache_dir=tmp / "cache", rate_per_min=600)
+        return PDFDownloader(save_root=tmp / "raw_pdfs", fetcher=AsyncFetcher(max_bytes=CAP), searcher=searcher)
+
+    d = make()
+    d.run(kw_json)
+    raw = tmp / "raw_pdfs"
+    pdfs = sorted(raw.rglob("*.pdf"))
+    check("one copy of each distinct PDF on disk", sorted(p.read_bytes() for p in pdfs) == sorted([PDF, PDF2]))
+    log = [json.loads(l) for l in d.url_log.read_text().splitlines()]
+    check("downloads logged with content hash", sum("sha256" in r for r in log) == 2)
+    # keywords run concurrently, so whichever fetches the shared PDF first stores it
+    shared = [p for p in pdfs if p.read_bytes() == PDF]
+    refs = {r["keyword"]: r["path"] for r in log if r.get("ref")}
+    check("duplicates referenced under their keyword", len(shared) == 1
+          and set(refs) == {"Flood", "Wildfire", "Storm"} - {shared[0].parent.name}
+          and all(Path(p) == shared[0] for p in refs.values()))
+    check("same-bytes duplicate not stored again", len(list(raw.rglob("*.pdf"))) == 2)
+
+    SEEN.clear()
+    make().run(kw_json)
+    check("rerun skips known URLs", not any(p in ("/ok.pdf", "/flaky.pdf", "/copy.pdf") for p, _ in SEEN))
+    check("rerun answers searches from the cache", CountingProvider.calls == 3)
+
+
+def main():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandIn)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_port}"
+    check.failed = False
+    with tempfile.TemporaryDirectory() as tmp:
+        asyncio.run(fetcher_checks(base, Path(tmp)))
+        downloader_checks(base, Path(tmp))
+    server.shutdown()
+    sys.exit(1 if check.failed else 0)
+
+
+if __name__ == "__main__":
+    main()
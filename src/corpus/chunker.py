@@ -1,64 +1,269 @@
 from pathlib import Path
 from tqdm import tqdm
 import json
+import re
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
 
-from langchain.embeddings.openai import OpenAIEmbeddings
-from langchain_experimental.text_splitter import SemanticChunker
+from langchain_experimental.text_splitter import SemanticChunker, combine_sentences
 
 from configs.path_config import DEDUP_TXT_ROOT, CHUNK_JSON_ROOT
 from configs.gen_config import (
     PDF_MAX_CHUNK_TOKENS,
+    CHUNK_MIN_TOKENS,
+    CHUNK_MODE,
     FIRST_CHUNK_ID,
     MAX_ITEMS_PER_JSON,
     OPENAI_API_KEY,
+    CHUNK_EMBED_BACKEND,
+    CHUNK_PREFETCH_FILES,
+    CHUNK_WORKERS,
 )
+from src.corpus.manifest import Manifest, config_digest, sha256_file
+from src.corpus.token_chunker import TokenWindowChunker
+
+
+def make_embeddings(backend: str):
+    if backend == "local":
+        from src.corpus.sentence_embed import LocalSentenceEmbeddings
+        return LocalSentenceEmbeddings()
+    if backend == "openai":
+        from langchain.embeddings.openai import OpenAIEmbeddings
+        return OpenAIEmbeddings(openai_api_key=OPENAI_API_KEY)
+    raise ValueError(f"unknown chunk embedding backend {backend!r}")
+
+
+_BREAKPOINT_AMOUNT = 95
+
+
+_WORKER: "Chunker | None" = None
+
+
+def _init_worker(chunker: "Chunker"):
+    global _WORKER
+    _WORKER = chunker
+    _WORKER.splitter = _WORKER._make_splitter()
+
+
+def _run_job(txt_path: Path) -> list[dict]:
+    return _WORKER._split(txt_path)
+
 
 class Chunker:
     def __init__(
         self,
         txt_root: Path = DEDUP_TXT_ROOT,
         out_root: Path = CHUNK_JSON_ROOT,
+        manifest: Manifest | None = None,
+        embed_backend: str = CHUNK_EMBED_BACKEND,
+        workers:  int  = CHUNK_WORKERS,
+        mode:     str  = CHUNK_MODE,
     ):
-        # initialize semantic chunker
-        self.splitter = SemanticChunker(
-            OpenAIEmbeddings(openai_api_key=OPENAI_API_KEY),
-            add_start_index=True,
-            breakpoint_threshold_amount=95,
-            max_chunk_tokens=PDF_MAX_CHUNK_TOKENS,
-            min_chunk_tokens=32,
-        )
+        """
+        `mode` is "semantic" (SemanticChunker over sentence embeddings) or
+        "token" (TokenWindowChunker, no embedding pass). Both emit the
+        same records. With workers > 1, files are split in a process pool. Chunk ids are
+        still assigned here, in sorted file order, so the output is the
+        same as a serial run.
+        """
+        self.embed_backend = embed_backend
+        self.mode     = mode
+        self.splitter = self._make_splitter()
         self.txt_root = Path(txt_root)
         self.out_root = Path(out_root)
         self.out_root.mkdir(parents=True, exist_ok=True)
+        self.workers  = workers
 
+        self.manifest = manifest
+        self.config   = self._config()
         self.doc_id = FIRST_CHUNK_ID
+        if manifest is not None:
+            self.doc_id = manifest.get("last_chunk_id", FIRST_CHUNK_ID)
         self.acc = []
         self.file_idx = 1
 
+    def __getstate__(self):
+        # workers only split text; they rebuild their own splitter
+        state = self.__dict__.copy()
+        state.update(splitter=None, manifest=None, acc=[])
+        return state
+
+    def _make_splitter(self):
+        if self.mode == "token":
+            return TokenWindowChunker()
+        if self.mode != "semantic":
+            raise ValueError(f"unknown chunking mode {self.mode!r}")
+        # initialize semantic chunker
+        return SemanticChunker(
+            make_embeddings(self.embed_backend),
+            add_start_index=True,
+            breakpoint_threshold_amount=_BREAKPOINT_AMOUNT,
+            max_chunk_tokens=PDF_MAX_CHUNK_TOKENS,
+            min_chunk_tokens=CHUNK_MIN_TOKENS,
+        )
+
+    def _config(self) -> str:
+        """
+        Digest of every setting the chunks of a file depend on; chunks
+        recorded under a different one are split again.
+        """
+        sp = self.splitter
+        if self.mode == "token":
+            params = dict(encoding=sp.encoding, max_tokens=sp.max_tokens,
+                          min_tokens=sp.min_tokens, overlap=sp.overlap)
+        else:
+            emb = sp.embeddings
+            params = dict(
+                breakpoint=(sp.breakpoint_threshold_type, _BREAKPOINT_AMOUNT),
+                buffer_size=sp.buffer_size,
+                max_tokens=PDF_MAX_CHUNK_TOKENS,
+                min_tokens=CHUNK_MIN_TOKENS,
+                embed=(self.embed_backend,
+                       getattr(emb, "model_name", getattr(emb, "model", None)),
+                       getattr(emb, "max_len", None)),
+            )
+        return config_digest(mode=self.mode, **params)
+
+    @property
+    def embeddings(self):
+        return getattr(self.splitter, "embeddings", None)
+
     def run(self):
-        all_txts = list(self.txt_root.rglob("*.txt"))
+        all_txts = sorted(self.txt_root.rglob("*.txt"))
         print(f"Found {len(all_txts)} files to chunk")
-        for txt_path in tqdm(sorted(all_txts), desc="Chunking"):
-            gen, spec = self._parse_folder(txt_path.parent.name)
-            self._handle_file(txt_path, spec, gen)
+        # with a manifest, chunks of unchanged files are reused as-is (same ids)
+        previous = self._load_previous() if self.manifest is not None else {}
+        pool = (
+            ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker, initargs=(self,))
+            if self.workers > 1 else nullcontext()
+        )
+        with pool, tqdm(total=len(all_txts), desc="Chunking") as bar:
+            for i in range(0, len(all_txts), CHUNK_PREFETCH_FILES):
+                plan = [self._plan(p, previous) for p in all_txts[i:i + CHUNK_PREFETCH_FILES]]
+                todo = [txt_path for txt_path, _, _, reused in plan if reused is None]
+                self._prefetch(todo)
+                split = self._map(pool, todo)
+                for txt_path, key, digest, reused in plan:
+                    if reused is not None:
+                        self._extend(reused)
+                    else:
+                        self._assign(txt_path, next(split), key, digest)
+                    bar.update()
 
         self._flush(final=True)
+        if hasattr(self.embeddings, "save"):
+            self.embeddings.save()
+        if self.manifest is not None:
+            self._drop_stale_outputs()
+            self.manifest.set("last_chunk_id", self.doc_id)
+            self.manifest.save()
+
+    def _plan(self, txt_path: Path, previous: dict):
+        """
+        (txt_path, manifest key, digest, reused chunks or None).
+        """
+        if self.manifest is None:
+            return txt_path, None, None, None
+        key, digest = Manifest.txt_key(txt_path), sha256_file(txt_path)
+        return txt_path, key, digest, self._reuse(key, digest, previous)
 
-    def _handle_file(self, txt_path: Path, spec: str, gen: str):
+    def _map(self, pool, txt_paths: list[Path]):
+        if isinstance(pool, ProcessPoolExecutor):
+            return pool.map(_run_job, txt_paths)
+        return map(self._split, txt_paths)
+
+    def _split(self, txt_path: Path) -> list[dict]:
+        """
+        Chunk records of one file, without ids.
+        """
+        gen, spec = self._parse_folder(txt_path.parent.name)
         text = txt_path.read_text(encoding="utf-8")
-        docs = self.splitter.create_documents([text])
-        for doc in docs:
-            self.doc_id += 1
-            self.acc.append({
+        return [
+            {
                 "page_content":  doc.page_content,
                 "specific_type": spec,
                 "general_type":  gen,
                 "source":        txt_path.stem,
-                "id":            self.doc_id,
-            })
+            }
+            for doc in self.splitter.create_documents([text])
+        ]
+
+    def _assign(self, txt_path: Path, records: list[dict], key: str | None, digest: str | None):
+        """
+        Give a freshly split file the next run of chunk ids.
+        """
+        first_id = self.doc_id + 1
+        for rec in records:
+            self.doc_id += 1
+            rec["id"] = self.doc_id
+        self._extend(records)
+
+        if self.manifest is not None:
+            self.manifest.record(key, "chunk", digest, self.config, first_id=first_id, count=len(records))
+
+    def _prefetch(self, txt_paths: list[Path]):
+        """
+        Embed the splitter's sentence groups of several files in shared
+        batches, so the per-file splits below hit the embedding cache.
+        """
+        if not hasattr(self.embeddings, "prefetch"):
+            return
+        groups = []
+        for txt_path in txt_paths:
+            text = txt_path.read_text(encoding="utf-8")
+            sentences = re.split(self.splitter.sentence_split_regex, text)
+            if len(sentences) < 2:
+                continue
+            groups.extend(
+                s["combined_sentence"] for s in combine_sentences(
+                    [{"sentence": x, "index": i} for i, x in enumerate(sentences)],
+                    self.splitter.buffer_size,
+                )
+            )
+        if groups:
+            self.embeddings.prefetch(groups)
+            # make the vectors visible to worker processes
+            if self.workers > 1:
+                self.embeddings.save()
+
+    def _extend(self, records: list[dict]):
+        for rec in records:
+            self.acc.append(rec)
             if len(self.acc) >= MAX_ITEMS_PER_JSON:
                 self._flush()
 
+    def _reuse(self, key: str, digest: str, previous: dict):
+        """
+        Return the previously written chunks of an unchanged file,
+        or None if it has to be chunked again.
+        """
+        if not self.manifest.is_current(key, "chunk", digest, self.config):
+            return None
+        rec = self.manifest.stage(key, "chunk")
+        ids = range(rec["first_id"], rec["first_id"] + rec["count"])
+        if not all(i in previous for i in ids):
+            return None
+        return [previous[i] for i in ids]
+
+    def _load_previous(self) -> dict:
+        """
+        Index the current chunk files by id.
+        """
+        previous = {}
+        for jf in sorted(self.out_root.glob("chunks_*.json")):
+            for rec in json.loads(jf.read_text(encoding="utf-8")):
+                previous[rec["id"]] = rec
+        return previous
+
+    def _drop_stale_outputs(self):
+        """
+        Remove chunks_XXX.json files beyond the last one written this run.
+        """
+        for jf in self.out_root.glob("chunks_*.json"):
+            idx = jf.stem.split("_")[-1]
+            if idx.isdigit() and int(idx) >= self.file_idx:
+                jf.unlink()
+
     def _flush(self, final: bool = False):
         if not self.acc:
             return
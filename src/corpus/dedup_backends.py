@@ -0,0 +1,171 @@
+# src/corpus/dedup_backends.py
+
+import gc
+from typing import Callable, Iterator, List, Tuple
+
+import numpy as np
+import torch
+from tqdm import tqdm
+from transformers import AutoTokenizer, AutoModel
+from usearch.index import Index
+
+from src.utils.embed import embed_texts
+from configs.gen_config import (
+    EMBED_DEDUP_MODEL,
+    EMBED_DEDUP_K,
+    EMBED_DEDUP_THREADS,
+    EMBED_DEDUP_THRESHOLD,
+    EMBED_DEDUP_BLOCK,
+)
+from configs.model_config import (
+    MODEL_CONFIGS,
+    MODEL_CACHE_DIR,
+    DEFAULT_BATCH,
+    DEFAULT_MAXLEN,
+    DEVICE,
+    DTYPE,
+)
+
+# A backend indexes N chunk texts and searches a subset of them for their
+# k nearest neighbours. Texts are never passed as one list: `texts(idx)`
+# yields the texts at ascending positions `idx` in blocks, so only one
+# block is in memory at a time. `search(texts, n, queries)` returns
+#   ids:  int64  (Q, k), positions into the texts, -1 where none was found
+#   sims: float32 (Q, k), similarity of each neighbour
+# `version` names everything that determines those results, for SearchCache.
+TextSource = Callable[[np.ndarray], Iterator[List[str]]]
+
+
+class TextSimBackend:
+    """
+    unisim TextSim approximate search (needs its accelerator stack).
+    """
+    def __init__(self, k: int = EMBED_DEDUP_K):
+        self.k = k
+        self.version = f"unisim;approx;k={k};threshold={EMBED_DEDUP_THRESHOLD}"
+
+    def search(self, texts: TextSource, n: int, queries: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        from unisim import TextSim
+
+        ts = TextSim(store_data=True, index_type="approx",
+                     batch_size=256, use_accelerator=True)
+        for block in tqdm(texts(np.arange(n)), desc="Indexing"):
+            ts.add(block)
+
+        ids  = np.full((len(queries), self.k), -1, dtype=np.int64)
+        sims = np.zeros((len(queries), self.k), dtype=np.float32)
+        i = 0
+        for block in tqdm(texts(queries), desc="Searching"):
+            res = ts.search(
+                block,
+                similarity_threshold=EMBED_DEDUP_THRESHOLD,
+                k=self.k,
+                drop_closest_match=False
+            )
+            for qi, r in enumerate(res.results):
+                for j, m in enumerate(r.matches[:self.k]):
+                    ids[i + qi, j]  = m.idx
+                    sims[i + qi, j] = m.similarity
+            i += len(block)
+        return ids, sims
+
+
+class LocalEmbedBackend:
+    """
+    Embed chunks locally with any model from MODEL_CONFIGS via
+    embed_texts, then run a multi-threaded usearch kNN self-search.
+    Vectors live only in the usearch index, which is filled block by block.
+    """
+    def __init__(
+        self,
+        model_name: str   = EMBED_DEDUP_MODEL,
+        k:          int   = EMBED_DEDUP_K,
+        threads:    int   = EMBED_DEDUP_THREADS,
+        batch_size: int   = DEFAULT_BATCH,
+        max_len:    int   = DEFAULT_MAXLEN,
+        device:     str   = DEVICE,
+        dtype:      torch.dtype = DTYPE,
+    ):
+        if model_name not in MODEL_CONFIGS:
+            raise KeyError(f"{model_name} is not in MODEL_CONFIGS")
+        self.model_name = model_name
+        self.cfg        = MODEL_CONFIGS[model_name]
+        self.k          = k
+        self.threads    = threads
+        self.batch_size = batch_size
+        self.max_len    = max_len
+        self.device     = device
+        self.dtype      = dtype
+        self.version    = f"local;{model_name};max_len={max_len};k={k}"
+
+    def embed(self, blocks: Iterator[List[str]]) -> Iterator[np.ndarray]:
+        """
+        L2-normalized float32 embeddings, one array per block of texts.
+        Rows of texts that failed to embed stay zero (no neighbours).
+        """
+        tok = AutoTokenizer.from_pretrained(
+            self.model_name, trust_remote_code=True, cache_dir=MODEL_CACHE_DIR
+        )
+        mdl = AutoModel.from_pretrained(
+            self.model_name, trust_remote_code=True, cache_dir=MODEL_CACHE_DIR
+        ).to(self.device).eval()
+
+        for block in blocks:
+            embs, valid = embed_texts(
+                mdl,
+                tok,
+                block,
+                max_len=self.max_len,
+                batch_size=self.batch_size,
+                pool_tag=self.cfg.get("pool", "cls"),
+                device=self.device,
+                dtype=self.dtype,
+                use_encode=self.cfg.get("use_encode", False),
+                desc=f"{self.model_name}-dedup"
+            )
+            out = np.zeros((len(block), embs.shape[1]), dtype=np.float32)
+            out[np.asarray(valid, dtype=np.int64)] = embs
+            yield out
+
+        del mdl, tok
+        torch.cuda.empty_cache()
+        gc.collect()
+
+    def knn(self, embs: np.ndarray, queries: np.ndarray | None = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        k nearest neighbours among all rows (inner product) of the rows
+        in `queries`, or of every row.
+        """
+        idx = Index(ndim=embs.shape[1], metric="ip", dtype="f32")
+        idx.add(np.arange(len(embs), dtype=np.int64), embs, threads=self.threads)
+        return self._search(idx, embs if queries is None else embs[queries])
+
+    def search(self, texts: TextSource, n: int, queries: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        idx, start = None, 0
+        for embs in self.embed(texts(np.arange(n))):
+            if idx is None:
+                idx = Index(ndim=embs.shape[1], metric="ip", dtype="f32")
+            idx.add(np.arange(start, start + len(embs), dtype=np.int64), embs, threads=self.threads)
+            start += len(embs)
+
+        ids  = np.full((len(queries), self.k), -1, dtype=np.int64)
+        sims = np.zeros((len(queries), self.k), dtype=np.float32)
+        step = EMBED_DEDUP_BLOCK
+        for i in tqdm(range(0, len(queries), step), desc="Searching"):
+            ids[i:i+step], sims[i:i+step] = self._search(idx, idx.get(queries[i:i+step]))
+        return ids, sims
+
+    def _search(self, idx: Index, vecs: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        hits = idx.search(vecs, self.k, threads=self.threads)
+        ids  = hits.keys.astype(np.int64)
+        sims = (1.0 - hits.distances).astype(np.float32)
+        ids[np.arange(self.k)[None, :] >= hits.counts[:, None]] = -1
+        return ids, sims
+
+
+def make_backend(name: str):
+    if name == "unisim":
+        return TextSimBackend()
+    if name == "local":
+        return LocalEmbedBackend()
+    raise ValueError(f"unknown embedding dedup backend {name!r}")
@@ -1,16 +1,16 @@
 # src/corpus/deduper.py
 
 import json
-import pickle
-import random
+import resource
 import shutil
 from pathlib import Path
-from collections import defaultdict
+from typing import Iterator
 from tqdm import tqdm
 
-from transformers import GPT2TokenizerFast
-from datasketch import MinHash, MinHashLSH
-from unisim import TextSim
+import numpy as np
+from datasketch import MinHash
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
 
 from configs.path_config import (
     CHUNK_JSON_ROOT,
@@ -19,114 +19,220 @@ from configs.path_config import (
     TXT_ROOT,
     DEDUP_TXT_ROOT,
     DUP_TXT_ROOT,
+    MINHASH_INDEX_DIR,
 )
-from configs.gen_config import MINHASH_THRESHOLD, MINHASH_PERM, MAX_ITEMS_PER_JSON
+from configs.gen_config import (
+    MAX_ITEMS_PER_JSON,
+    EMBED_DEDUP_BACKEND,
+    EMBED_DEDUP_THRESHOLD,
+    EMBED_DEDUP_BLOCK,
+    MINHASH_THRESHOLD,
+)
+from src.corpus.dedup_backends import make_backend
+from src.corpus.search_cache import SearchCache, content_keys, EMPTY
+from src.corpus.manifest import Manifest, config_digest, sha256_file, sha256_text
+from src.corpus.minhash  import SignatureEngine, MinHashIndex, NGRAM
+
+
+def _copy_target(src: Path, dst_root: Path) -> Path:
+    return dst_root / src.relative_to(src.parents[2])
 
 
 def _copy_file(src: Path, dst_root: Path) -> None:
     """
     Copy src file under dst_root, preserving folder structure.
     """
-    rel = src.relative_to(src.parents[2])
-    target = dst_root / rel
+    target = _copy_target(src, dst_root)
     target.parent.mkdir(parents=True, exist_ok=True)
     shutil.copy2(src, target)
 
 
+def _components(ids: np.ndarray, sims: np.ndarray, threshold: float) -> np.ndarray:
+    """
+    Connected-component label per chunk of the graph whose edges are
+    neighbour pairs (i, ids[i, j]) with sims[i, j] >= threshold.
+    """
+    n, k = ids.shape
+    src = np.repeat(np.arange(n, dtype=np.int64), k)
+    dst = ids.ravel()
+    m = (dst >= 0) & (dst != src) & (sims.ravel() >= threshold)
+    graph = coo_matrix(
+        (np.ones(int(m.sum()), dtype=np.int8), (src[m], dst[m])), shape=(n, n)
+    )
+    _, labels = connected_components(graph, directed=False)
+    return labels
+
+
+class ChunkFiles:
+    """
+    Chunk JSON files read lazily. Only per-chunk content keys and
+    per-file offsets stay in memory; text is loaded one file at a time.
+    """
+    def __init__(self, files: list[Path]):
+        self.files = files
+        keys, counts = [], [0]
+        for jf in tqdm(files, desc="Scanning chunks"):
+            texts = [d["page_content"] for d in self.load(jf)]
+            keys.append(content_keys(texts))
+            counts.append(len(texts))
+        self.keys    = np.concatenate(keys) if keys else np.empty(0, dtype=np.uint64)
+        self.offsets = np.cumsum(counts)
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    @staticmethod
+    def load(jf: Path) -> list[dict]:
+        return json.loads(jf.read_text(encoding="utf-8"))
+
+    def texts(self, positions: np.ndarray, step: int = EMBED_DEDUP_BLOCK) -> Iterator[list[str]]:
+        """
+        Texts at ascending `positions`, in blocks of at most `step`.
+        """
+        buf = []
+        fis = np.searchsorted(self.offsets, positions, side="right") - 1
+        for rows in np.split(positions, np.flatnonzero(np.diff(fis)) + 1):
+            if not len(rows):
+                continue
+            fi = np.searchsorted(self.offsets, rows[0], side="right") - 1
+            data = self.load(self.files[fi])
+            for r in rows - self.offsets[fi]:
+                buf.append(data[r]["page_content"])
+                if len(buf) == step:
+                    yield buf
+                    buf = []
+        if buf:
+            yield buf
+
+
 class EmbeddingDeduper:
     def __init__(
         self,
         chunk_root: Path = CHUNK_JSON_ROOT,
         out_root:   Path = EMBED_DEDUP_ROOT,
-        cache_dir:  Path = SEARCH_CACHE_DIR
+        cache_dir:  Path = SEARCH_CACHE_DIR,
+        manifest:   Manifest | None = None,
+        backend:    str  = EMBED_DEDUP_BACKEND,
     ):
         self.chunk_root = Path(chunk_root)
         self.out_root   = Path(out_root)
         self.cache      = Path(cache_dir)
+        self.manifest   = manifest
+        self.backend    = backend
         self.out_root.mkdir(parents=True, exist_ok=True)
         self.cache.mkdir(parents=True, exist_ok=True)
 
     def run(self):
         """
         Run embedding-based deduplication: cluster chunks and keep one per cluster.
+        With a manifest, skip entirely when the chunk files and the dedup
+        settings are unchanged.
+        Chunk files are streamed, so memory holds one block of text plus
+        a few arrays per chunk regardless of corpus size.
         """
-        contents, items = self._load_items()
-        keep = self._dedupe_indices(contents)
-        self._write_unique(items, keep)
-
-    def _load_items(self):
-        contents, items = [], []
-        for jf in self.chunk_root.glob("*.json"):
-            data = json.loads(jf.read_text(encoding="utf-8"))
-            contents.extend([d["page_content"] for d in data])
-            items.extend(data)
-        return contents, items
-
-    def _dedupe_indices(self, contents):
-        """
-        Build approximate index with TextSim and union similar items.
-        """
-        ts = TextSim(store_data=True, index_type="approx",
-                     batch_size=256, use_accelerator=True)
-
-        # index in batches
-        step = MAX_ITEMS_PER_JSON
-        for i in tqdm(range(0, len(contents), step), desc="Indexing"):
-            ts.add(contents[i:i+step])
-
-        # union-find for cluster merging
-        parent = list(range(len(contents)))
-
-        def find(x):
-            while parent[x] != x:
-                parent[x] = parent[parent[x]]
-                x = parent[x]
-            return x
-
-        def union(a, b):
-            ra, rb = find(a), find(b)
-            if ra != rb:
-                parent[rb] = ra
-
-        # search similar items and union by threshold
-        for i in tqdm(range(0, len(contents), step), desc="Searching"):
-            cache_f = self.cache / f"batch_{i//step:04d}.pkl"
-            if cache_f.exists():
-                res = pickle.loads(cache_f.read_bytes())
-            else:
-                res = ts.search(
-                    contents[i:i+step],
-                    similarity_threshold=MINHASH_THRESHOLD,
-                    k=10,
-                    drop_closest_match=False
-                )
-                cache_f.write_bytes(pickle.dumps(res))
-
-            for qi, r in enumerate(res.results):
-                src = i + qi
-                for m in r.matches:
-                    if m.idx != src and m.similarity >= MINHASH_THRESHOLD:
-                        union(src, m.idx)
-
-        clusters = defaultdict(list)
-        for idx in range(len(contents)):
-            clusters[find(idx)].append(idx)
-        random.seed(42)
-        return {random.choice(v) for v in clusters.values()}
-
-    def _write_unique(self, items, keep):
-        """
-        Write only unique items (by index in keep) into JSON files.
-        """
-        kept = [items[i] for i in sorted(keep)]
-        step = MAX_ITEMS_PER_JSON
-        for i in range(0, len(kept), step):
-            out = self.out_root / f"deduped_{i//step:03d}.json"
+        if self.manifest is not None:
+            digest, config = self._chunk_digest(), self._config()
+            if self.manifest.stage_is_current("embed_dedup", digest, config) and any(self.out_root.glob("deduped_*.json")):
+                print("Embedding dedup up to date")
+                return
+
+        chunks = ChunkFiles(sorted(self.chunk_root.glob("*.json")))
+        keep = self._dedupe_indices(chunks)
+        self._write_unique(chunks, keep)
+        print(f"peak RSS {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} MB")
+
+        if self.manifest is not None:
+            self.manifest.record_stage("embed_dedup", digest, config, kept=len(keep))
+            self.manifest.save()
+
+    def _config(self) -> str:
+        return config_digest(
+            backend=make_backend(self.backend).version,
+            threshold=EMBED_DEDUP_THRESHOLD,
+            per_json=MAX_ITEMS_PER_JSON,
+        )
+
+    def _chunk_digest(self) -> str:
+        files = sorted(self.chunk_root.glob("*.json"))
+        return sha256_text("".join(f"{jf.name}:{sha256_file(jf)};" for jf in files))
+
+    def _dedupe_indices(self, chunks: ChunkFiles) -> np.ndarray:
+        """
+        Find near-duplicate neighbours with the configured backend, then
+        keep the first chunk of every connected component. Returns the
+        kept positions, ascending.
+
+        Work is done once per distinct text (exact copies share a key and
+        fall into one component). Neighbour lists are cached by content
+        key, so only texts not seen before are searched. Lists cached
+        before new texts arrived do not point at them, but the new texts'
+        own searches supply those edges since components are undirected.
+        """
+        if not len(chunks):
+            return np.empty(0, dtype=np.int64)
+        uniq, first, inv = np.unique(chunks.keys, return_index=True, return_inverse=True)
+
+        backend = make_backend(self.backend)
+        cache = SearchCache(self.cache, backend.version, backend.k)
+        hit, nbrs, sims = cache.lookup(uniq)
+        miss = np.flatnonzero(~hit)
+        print(f"Embedding dedup: {len(uniq)} distinct chunks, {len(miss)} to search")
+        if len(miss):
+            # the backend sees distinct texts in file order (b = 0..n-1),
+            # so text blocks are read sequentially
+            order = np.argsort(first)
+            rank = np.empty_like(order)
+            rank[order] = np.arange(len(order))
+            queries = np.sort(rank[miss])
+            miss = order[queries]
+            ids, sims[miss] = backend.search(lambda b: chunks.texts(first[order[b]]), len(uniq), queries)
+            nbrs[miss] = np.where(ids >= 0, uniq[order[ids]], EMPTY)
+        if len(miss) or len(cache) != len(uniq):
+            cache.save(uniq, nbrs, sims)
+
+        # neighbour keys → positions in uniq (-1 if gone from the corpus)
+        pos = np.searchsorted(uniq, nbrs).clip(max=len(uniq) - 1)
+        ids = np.where((uniq[pos] == nbrs) & (nbrs != EMPTY), pos, -1)
+
+        labels = _components(ids, sims, EMBED_DEDUP_THRESHOLD)[inv]
+        _, keep = np.unique(labels, return_index=True)
+        return np.sort(keep)
+
+    def _write_unique(self, chunks: ChunkFiles, keep: np.ndarray):
+        """
+        Stream kept items (by position in keep) into JSON files,
+        one chunk file in memory at a time.
+        """
+        mask = np.zeros(len(chunks), dtype=bool)
+        mask[keep] = True
+        step, buf, n_out = MAX_ITEMS_PER_JSON, [], 0
+
+        def flush():
+            nonlocal buf, n_out
+            out = self.out_root / f"deduped_{n_out:03d}.json"
             out.write_text(
-                json.dumps(kept[i:i+step], ensure_ascii=False, indent=2),
+                json.dumps(buf, ensure_ascii=False, indent=2),
                 encoding="utf-8"
             )
-        print(f"kept {len(kept)} unique chunks")
+            buf, n_out = [], n_out + 1
+
+        for fi, jf in enumerate(chunks.files):
+            lo, hi = chunks.offsets[fi], chunks.offsets[fi + 1]
+            if not mask[lo:hi].any():
+                continue
+            for item, kept in zip(chunks.load(jf), mask[lo:hi]):
+                if kept:
+                    buf.append(item)
+                    if len(buf) == step:
+                        flush()
+        if buf:
+            flush()
+
+        # outputs of an earlier, larger run
+        for old in self.out_root.glob("deduped_*.json"):
+            if int(old.stem.split("_")[1]) >= n_out:
+                old.unlink()
+        print(f"kept {len(keep)} unique chunks")
 
 
 class MinHashDeduper:
@@ -134,44 +240,128 @@ class MinHashDeduper:
         self,
         src_root    = TXT_ROOT,
         dst_unique  = DEDUP_TXT_ROOT,
-        dst_dup     = DUP_TXT_ROOT
+        dst_dup     = DUP_TXT_ROOT,
+        index_root  = MINHASH_INDEX_DIR,
+        manifest: Manifest | None = None,
     ):
-        self.src_root = Path(src_root)
-        self.dst_u    = Path(dst_unique)
-        self.dst_d    = Path(dst_dup)
+        self.src_root   = Path(src_root)
+        self.dst_u      = Path(dst_unique)
+        self.dst_d      = Path(dst_dup)
+        self.index_root = Path(index_root)
+        self.manifest   = manifest
         for p in (self.dst_u, self.dst_d):
             p.mkdir(parents=True, exist_ok=True)
-        self.tok = GPT2TokenizerFast.from_pretrained("gpt2")
+        self.engine = SignatureEngine()
 
     def run(self):
         """
         Run MinHash-based deduplication: unique files → dst_unique, duplicates → dst_dup.
+        Files are visited in sorted path order, so within a duplicate group
+        the first path is always the keeper. Keeper signatures are persisted
+        in a MinHashIndex for later incremental runs.
         """
-        files = list(self.src_root.rglob("*.txt"))
-        random.shuffle(files)
-
-        lsh = MinHashLSH(threshold=MINHASH_THRESHOLD, num_perm=MINHASH_PERM)
-        next_idx = 0
-
-        for fp in tqdm(files, desc="MinHash dedup"):
-            txt = fp.read_text(encoding="utf-8")
-            mh = self._text2_minhash(txt)
+        files = sorted(self.src_root.rglob("*.txt"))
+        if self.manifest is not None:
+            return self._run_incremental(files)
 
-            if lsh.query(mh):
+        index = MinHashIndex(self.index_root, fresh=True)
+        sigs = self.engine.from_files(files)
+        for fp, sig in tqdm(zip(files, sigs), total=len(files), desc="MinHash dedup"):
+            if index.query(sig):
                 _copy_file(fp, self.dst_d)
             else:
-                lsh.insert(str(next_idx), mh)
-                next_idx += 1
+                index.add(self._key(fp), sig)
                 _copy_file(fp, self.dst_u)
+        index.save()
+
+    def _run_incremental(self, files: list[Path]):
+        """
+        Keep recorded verdicts for unchanged files and only dedupe new or
+        changed ones against the persisted index of existing keepers.
+
+        A "dup" verdict records the keeper it matched. When that keeper is
+        deleted, changed or gone from the index, the dup is deduped again,
+        so one surviving copy of the text is promoted to unique.
+        """
+        index = MinHashIndex(self.index_root)
+        self._drop_orphans(files, index)
+        # verdicts depend on these; a change re-dedupes every file
+        config = config_digest(
+            threshold=MINHASH_THRESHOLD, num_perm=self.engine.num_perm,
+            hash_mode=self.engine.hash_mode, ngram=NGRAM,
+        )
+
+        fresh, missing, dups, digests = [], [], [], {}
+        for fp in files:
+            key = Manifest.txt_key(fp)
+            digests[fp] = sha256_file(fp)
+            rec = self.manifest.stage(key, "minhash")
+            if self.manifest.is_current(key, "minhash", digests[fp], config):
+                root = self.dst_u if rec["verdict"] == "unique" else self.dst_d
+                if _copy_target(fp, root).exists():
+                    if rec["verdict"] == "unique" and self._key(fp) not in index:
+                        missing.append(fp)
+                    elif rec["verdict"] == "dup":
+                        dups.append(fp)
+                    continue
+            fresh.append(fp)
+
+        # keepers recorded before the index existed (or after it was lost)
+        for fp, sig in zip(missing, self.engine.from_files(missing)):
+            index.add(self._key(fp), sig)
+
+        # dups whose keeper is no longer there as it was
+        changed = {self._key(fp) for fp in fresh}
+        for fp in dups:
+            keeper = self.manifest.stage(Manifest.txt_key(fp), "minhash").get("keeper")
+            if keeper is None or keeper in changed or keeper not in index:
+                fresh.append(fp)
+        fresh.sort()
+
+        print(f"MinHash dedup: {len(fresh)} new or changed, {len(index)} keepers indexed")
+        if fresh:
+            for fp in fresh:
+                # a changed file may flip verdict; clear its old state first
+                index.remove(self._key(fp))
+                for root in (self.dst_u, self.dst_d):
+                    _copy_target(fp, root).unlink(missing_ok=True)
+
+            sigs = self.engine.from_files(fresh)
+            for fp, sig in tqdm(zip(fresh, sigs), total=len(fresh), desc="MinHash dedup"):
+                hits = index.query(sig)
+                if hits:
+                    _copy_file(fp, self.dst_d)
+                    info = {"verdict": "dup", "keeper": hits[0]}
+                else:
+                    index.add(self._key(fp), sig)
+                    _copy_file(fp, self.dst_u)
+                    info = {"verdict": "unique"}
+                self.manifest.record(Manifest.txt_key(fp), "minhash", digests[fp], config, **info)
+
+        index.save()
+        self.manifest.save()
+
+    @staticmethod
+    def _key(fp: Path) -> str:
+        """
+        Index key of a source file: its copy path relative to dst_unique.
+        """
+        return _copy_target(fp, Path()).as_posix()
+
+    def _drop_orphans(self, files: list[Path], index: MinHashIndex):
+        """
+        Remove copies (and index entries) whose source .txt is gone.
+        """
+        live = {_copy_target(fp, Path()) for fp in files}
+        for root in (self.dst_u, self.dst_d):
+            for copy in (root / self.src_root.name).rglob("*.txt"):
+                rel = copy.relative_to(root)
+                if rel not in live:
+                    index.remove(rel.as_posix())
+                    copy.unlink()
 
     def _text2_minhash(self, txt: str) -> MinHash:
         """
         Convert text to a MinHash sketch of n-grams of token IDs.
         """
-        mh = MinHash(num_perm=MINHASH_PERM)
-        ids = self.tok.encode(txt, add_special_tokens=False)
-        n = 3
-        for i in range(len(ids) - n + 1):
-            gram = tuple(ids[i:i+n])
-            mh.update(str(gram).encode())
-        return mh
+        return self.engine.minhash(self.engine.from_texts([txt])[0])
@@ -1,24 +1,38 @@
 # src/corpus/downloader.py
 
+import asyncio
+import hashlib
 import json
-import time
+import os
 from pathlib import Path
+from urllib.parse import urlsplit
 
-import requests
-from googlesearch import search
 from tqdm import tqdm
 
-from configs.path_config import RAW_PDF_ROOT, SEARCH_CACHE_DIR
-from configs.gen_config import MAX_PDFS_PER_KEYWORD, GOOGLE_PAUSE_SEC, HTTP_429_SLEEP_MIN
+from configs.path_config import RAW_PDF_ROOT
+from configs.gen_config import MAX_PDFS_PER_KEYWORD
+from src.corpus.fetcher import AsyncFetcher
+from src.corpus.registry import DownloadRegistry, normalize_url
+from src.corpus.search_providers import CachedSearch
 
 
 class PDFDownloader:
-    def __init__(self, save_root: Path = RAW_PDF_ROOT):
+    def __init__(
+        self,
+        save_root: Path = RAW_PDF_ROOT,
+        fetcher:   AsyncFetcher | None = None,
+        searcher:  CachedSearch | None = None,
+    ):
         self.save_root = Path(save_root)
         self.save_root.mkdir(parents=True, exist_ok=True)
-        # Path-to-URL mapping for downloaded PDFs
+        self.fetcher  = fetcher or AsyncFetcher()
+        self.searcher = searcher or CachedSearch()
+        # Downloads and keyword associations across all keywords: the legacy
+        # path-to-URL JSON snapshot plus an append-only log
         self.result_json = self.save_root.parent / "download_pdf_url.json"
-        self._url_map = self._load_url_map()
+        self.url_log     = self.save_root.parent / "download_pdf_url.jsonl"
+        self.registry    = DownloadRegistry(self.url_log, legacy_json=self.result_json)
+        self._inflight: dict[str, asyncio.Task] = {}
 
     def run(self, keywords_json: Path):
         """
@@ -26,86 +40,108 @@ class PDFDownloader:
         """
         with open(keywords_json, "r", encoding="utf-8") as f:
             keywords = json.load(f)
+        asyncio.run(self._run(keywords))
 
-        for kw in tqdm(keywords, desc="Downloading PDFs"):
-            safe_kw = self._sanitize_folder_name(kw)
-            kw_dir = self.save_root / safe_kw
-            kw_dir.mkdir(exist_ok=True)
-
-            query = f"{kw} hazard pdf filetype:pdf"
-            urls = self._safe_search(query)
-
-            pdf_count = 0
-            for url in urls:
-                if not url.lower().endswith(".pdf"):
+    async def _run(self, keywords: list[str]):
+        """
+        Keywords run concurrently: searches are limited by the searcher's
+        rate limit, downloads by the fetcher's connection pool.
+        """
+        async with self.fetcher:
+            tasks = [self._keyword(kw) for kw in keywords]
+            for done in tqdm(asyncio.as_completed(tasks), total=len(tasks), desc="Downloading PDFs"):
+                await done
+
+    async def _keyword(self, kw: str):
+        safe_kw = self._sanitize_folder_name(kw)
+        kw_dir = self.save_root / safe_kw
+        kw_dir.mkdir(exist_ok=True)
+
+        # URLs already resolved for this keyword are kept, not fetched again
+        known = self.registry.known_urls(safe_kw)
+        if len(known) >= MAX_PDFS_PER_KEYWORD:
+            return
+
+        urls = await self.searcher.search(kw)
+        urls = [u for u in dict.fromkeys(urls) if urlsplit(u).path.lower().endswith(".pdf") and u not in known]
+        await self._download_keyword(kw_dir, urls, MAX_PDFS_PER_KEYWORD - len(known))
+
+    async def _download_keyword(self, kw_dir: Path, urls: list[str], need: int):
+        """
+        Resolve candidates concurrently, `need` at a time, until `need`
+        PDFs are associated with the keyword or the candidates run out.
+        A PDF that another keyword already has (same normalized URL, or
+        same content) is referenced rather than stored again.
+        """
+        kw = kw_dir.name
+        while need > 0 and urls:
+            batch, urls = urls[:need], urls[need:]
+            paths = await asyncio.gather(
+                *(self._resolve(url, kw_dir) for url in batch), return_exceptions=True
+            )
+            for url, path in zip(batch, paths):
+                if isinstance(path, Exception):
+                    print(f"Failed to resolve {url!r}: {path!r}")
                     continue
+                if path is None:
+                    continue
+                if url in self.registry.urls[kw]:
+                    # stored into kw_dir by _download just now
+                    need -= 1
+                    continue
+                if kw not in self.registry.keywords[str(path)]:
+                    need -= 1
+                self.registry.reference(path, url, kw)
 
-                save_path = kw_dir / f"file_{pdf_count+1}.pdf"
-                if self._download(url, save_path):
-                    pdf_count += 1
-                    self._url_map[str(save_path)] = url
-                    self._save_url_map()
-                if pdf_count >= MAX_PDFS_PER_KEYWORD:
-                    break
-
-            # Wait to avoid Google blocking after each keyword
-            time.sleep(GOOGLE_PAUSE_SEC)
-
-    @staticmethod
-    def _safe_search(query: str, retries: int = 3) -> list[str]:
+    async def _resolve(self, url: str, kw_dir: Path) -> Path | None:
         """
-        Wrapper for Google search with HTTP 429 retry handling.
+        The PDF behind `url`: already on disk, being downloaded for another
+        keyword (shared), or downloaded now into kw_dir.
         """
-        for attempt in range(retries):
-            try:
-                return list(search(query, num=10, stop=40, pause=GOOGLE_PAUSE_SEC))
-            except Exception as e:
-                if "429" in str(e):
-                    print(f"HTTP 429 – sleeping {HTTP_429_SLEEP_MIN} minutes before retrying...")
-                    time.sleep(HTTP_429_SLEEP_MIN * 60)
-                else:
-                    print(f"Search error: {e}")
-                    return []
-        return []
-
-    @staticmethod
-    def _download(url: str, path: Path) -> bool:
+        known = self.registry.path_for_url(url)
+        if known is not None:
+            return known
+        key = normalize_url(url)
+        if key not in self._inflight:
+            self._inflight[key] = asyncio.ensure_future(self._download(url, kw_dir))
+        return await self._inflight[key]
+
+    async def _download(self, url: str, kw_dir: Path) -> Path | None:
         """
-        Download a single PDF from URL to disk.
+        None if the URL failed; an error here must not cancel the other
+        downloads gathered with it.
         """
-        headers = {
-            "User-Agent": (
-                "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-                "AppleWebKit/537.36 (KHTML, like Gecko) "
-                "Chrome/120.0.0.0 Safari/537.36"
-            )
-        }
         try:
-            r = requests.get(url, headers=headers, stream=True, timeout=10)
-            r.raise_for_status()
-            with open(path, "wb") as f:
-                for chunk in r.iter_content(chunk_size=8192):
-                    f.write(chunk)
-            return True
+            part = self._part_path(kw_dir, url)
+            digest = await self.fetcher.fetch(url, part)
+            if digest is None:
+                return None
+            same = self.registry.path_for_hash(digest)
+            if same is not None:
+                # same bytes under another URL: keep one copy
+                part.unlink()
+                return same
+            save_path = self._next_free_path(kw_dir)
+            os.replace(part, save_path)
+            self.registry.add(save_path, url, digest, kw_dir.name)
+            return save_path
         except Exception as e:
-            print(f"Download failed for {url!r}: {e}")
-            return False
+            print(f"Failed to store {url!r}: {e!r}")
+            return None
 
-    def _load_url_map(self) -> dict:
-        """
-        Load existing URL mapping if it exists.
-        """
-        if self.result_json.exists():
-            with open(self.result_json, "r", encoding="utf-8") as f:
-                return json.load(f)
-        return {}
+    @staticmethod
+    def _next_free_path(kw_dir: Path) -> Path:
+        n = 1
+        while (kw_dir / f"file_{n}.pdf").exists():
+            n += 1
+        return kw_dir / f"file_{n}.pdf"
 
-    def _save_url_map(self) -> None:
+    @staticmethod
+    def _part_path(kw_dir: Path, url: str) -> Path:
         """
-        Save updated URL mapping to disk.
+        Stable partial-download path per URL, so a later run resumes it.
         """
-        with open(self.result_json, "w", encoding="utf-8") as f:
-            json.dump(self._url_map, f, ensure_ascii=False, indent=2)
+        return kw_dir / f".{hashlib.sha1(url.encode()).hexdigest()[:16]}.pdf.part"
 
     @staticmethod
     def _sanitize_folder_name(name: str) -> str:
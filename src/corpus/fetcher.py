@@ -0,0 +1,156 @@
+# src/corpus/fetcher.py
+
+import asyncio
+import hashlib
+from pathlib import Path
+
+import aiohttp
+
+from configs.gen_config import (
+    DOWNLOAD_CONCURRENCY,
+    DOWNLOAD_PER_HOST,
+    DOWNLOAD_TIMEOUT_SEC,
+    DOWNLOAD_MAX_MB,
+    DOWNLOAD_RETRIES,
+)
+
+HEADERS = {
+    "User-Agent": (
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+        "AppleWebKit/537.36 (KHTML, like Gecko) "
+        "Chrome/120.0.0.0 Safari/537.36"
+    )
+}
+PDF_MAGIC = b"%PDF"
+_BLOCK    = 1 << 16
+
+
+class Rejected(Exception):
+    """
+    The response is not something we want (not a PDF, too large, 4xx);
+    retrying will not help and the partial file is dropped.
+    """
+
+
+class AsyncFetcher:
+    """
+    Pooled asyncio PDF downloads.
+
+    One aiohttp session is shared by all downloads, with at most
+    `concurrency` connections in total and `per_host` per host. A download
+    streams into `<target>.part`; an interrupted transfer is resumed with
+    an HTTP Range request, on retry or on a later run. Transfers are
+    aborted early when the body does not start with %PDF or when
+    Content-Length (or the bytes received) exceed `max_bytes`.
+
+        async with AsyncFetcher() as fetcher:
+            sha256 = await fetcher.fetch(url, part_path)
+
+    The SHA-256 of the file is computed while it is written (a resumed
+    part is read back once), so no second pass over it is needed.
+    """
+    def __init__(
+        self,
+        concurrency: int   = DOWNLOAD_CONCURRENCY,
+        per_host:    int   = DOWNLOAD_PER_HOST,
+        timeout:     float = DOWNLOAD_TIMEOUT_SEC,
+        max_bytes:   int   = DOWNLOAD_MAX_MB << 20,
+        retries:     int   = DOWNLOAD_RETRIES,
+    ):
+        self.concurrency = concurrency
+        self.per_host    = per_host
+        self.timeout     = timeout
+        self.max_bytes   = max_bytes
+        self.retries     = retries
+        self.session: aiohttp.ClientSession | None = None
+
+    async def __aenter__(self):
+        self.session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=self.concurrency, limit_per_host=self.per_host),
+            timeout=aiohttp.ClientTimeout(sock_connect=self.timeout, sock_read=self.timeout),
+            headers=HEADERS,
+        )
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.session.close()
+
+    async def fetch(self, url: str, part: Path) -> str | None:
+        """
+        Download `url` into the file `part`, resuming what is already there.
+        Returns the file's SHA-256 once it holds the complete PDF, else None.
+        Never raises: a failure only costs this URL.
+        """
+        for attempt in range(self.retries):
+            try:
+                digest = await self._transfer(url, part)
+                if digest is not None:
+                    return digest
+            except Rejected as e:
+                print(f"Skipped {url!r}: {e}")
+                part.unlink(missing_ok=True)
+                return None
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if attempt == self.retries - 1:
+                    print(f"Download failed for {url!r}: {e!r}")
+                    return None
+                await asyncio.sleep(2 ** attempt)
+            except Exception as e:
+                # not a transfer problem (bad URL/header, local write error): no retry
+                print(f"Download failed for {url!r}: {e!r}")
+                return None
+        return None
+
+    @staticmethod
+    def _hash_part(part: Path):
+        h = hashlib.sha256()
+        with open(part, "rb") as f:
+            for block in iter(lambda: f.read(_BLOCK), b""):
+                h.update(block)
+        return h
+
+    async def _transfer(self, url: str, part: Path) -> str | None:
+        """
+        One attempt, returning the SHA-256 of the finished file.
+        None if the partial file had to be discarded.
+        """
+        have = part.stat().st_size if part.exists() else 0
+        headers = {"Range": f"bytes={have}-"} if have else {}
+        async with self.session.get(url, headers=headers) as r:
+            if r.status == 416 and have:
+                # "bytes */<total>": complete if the part is exactly that long,
+                # otherwise the resource changed and we start over
+                if r.headers.get("Content-Range", "").rpartition("/")[2] == str(have):
+                    return self._hash_part(part).hexdigest()
+                part.unlink()
+                return None
+            if 400 <= r.status < 500:
+                raise Rejected(f"HTTP {r.status}")
+            r.raise_for_status()
+
+            resumed = have and r.status == 206
+            if not resumed:
+                have = 0
+            h = self._hash_part(part) if resumed else hashlib.sha256()
+            if r.content_length is not None and have + r.content_length > self.max_bytes:
+                raise Rejected(f"{have + r.content_length} bytes exceeds the size cap")
+
+            with open(part, "ab" if resumed else "wb") as f:
+                # a fresh body is checked for %PDF before anything is written
+                head = None if resumed else b""
+                async for block in r.content.iter_chunked(_BLOCK):
+                    if head is not None:
+                        head += block
+                        if len(head) < len(PDF_MAGIC):
+                            continue
+                        if not head.startswith(PDF_MAGIC):
+                            raise Rejected("not a PDF")
+                        block, head = head, None
+                    have += len(block)
+                    if have > self.max_bytes:
+                        raise Rejected("body exceeds the size cap")
+                    f.write(block)
+                    h.update(block)
+                if head is not None:
+                    raise Rejected("not a PDF")
+        return h.hexdigest()
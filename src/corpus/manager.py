@@ -1,32 +1,59 @@
 # src/corpus/manager.py
 
 from pathlib import Path
-import json, glob
 from typing import List
 
+from configs.path_config import EMBED_DEDUP_ROOT
+from src.corpus.passage_store import PassageStore
+
 class CorpusManager:
     """
-    Build or load an ordered JSON corpus of passages.
+    Build or load the ordered corpus of passages as a memory-mapped
+    PassageStore, built straight from the deduped_*.json chunk files that
+    EmbeddingDeduper writes (EMBED_DEDUP_ROOT by default).
     """
-    def __init__(self, corpus_dir: str, out_fp: str):
-        self.corpus_dir  = Path(corpus_dir)
-        self.ordered_json = Path(out_fp)
+    def __init__(self, corpus_dir: str = EMBED_DEDUP_ROOT, store_dir: str | None = None, pattern: str = "deduped_*.json"):
+        self.corpus_dir = Path(corpus_dir)
+        self.store_dir  = Path(store_dir) if store_dir else self.corpus_dir
+        self.pattern    = pattern
+
+    def sources(self) -> List[Path]:
+        """
+        The chunk files, in corpus order. Raises if there are none rather
+        than letting a store of 0 passages through.
+        """
+        files = sorted(self.corpus_dir.glob(self.pattern))
+        if not files:
+            raise FileNotFoundError(f"no {self.pattern} chunk files in {self.corpus_dir}; run the corpus build first")
+        return files
+
+    def build(self) -> PassageStore:
+        return PassageStore.build(self.sources(), self.store_dir)
 
-    def build(self) -> List[str]:
-        files = sorted(glob.glob(str(self.corpus_dir / "*.json")))
-        corpus: List[str] = []
-        for fp in files:
-            for txt in json.load(open(fp, encoding="utf-8")):
-                t = txt.strip()
-                if t:
-                    corpus.append(t)
-        self.ordered_json.parent.mkdir(parents=True, exist_ok=True)
-        json.dump(corpus,
-                  open(self.ordered_json, "w", encoding="utf-8"),
-                  ensure_ascii=False)
-        print(f"built corpus {self.ordered_json} ({len(corpus):,d})")
-        return corpus
+    def load(self) -> PassageStore:
+        """
+        Open the passage store, (re)building it first if it is missing or
+        older than any chunk file.
+        """
+        if PassageStore.exists(self.store_dir):
+            store = PassageStore(self.store_dir)
+            if store.is_current(self.sources()):
+                return store
+        return self.build()
 
-    def load(self) -> List[str]:
-        """Load ordered JSON corpus."""
-        return json.load(open(self.ordered_json, encoding="utf-8"))
+    def open(self) -> PassageStore:
+        """
+        Open the existing passage store read-only, never rebuilding it.
+        For readers of stored passage ids (label pools), which are only
+        valid against the store they were built from, and which may run
+        as many processes at once.
+        """
+        if not PassageStore.exists(self.store_dir):
+            raise FileNotFoundError(f"no passage store in {self.store_dir}; build the label pools first")
+        store = PassageStore(self.store_dir)
+        if not store.is_current(self.sources()):
+            raise RuntimeError(
+                f"passage store in {self.store_dir} is older than the chunk files in {self.corpus_dir}; "
+                "rebuild it together with the label pools"
+            )
+        return store
@@ -0,0 +1,142 @@
+# src/corpus/manifest.py
+
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Iterable, Optional
+
+from configs.path_config import MANIFEST_PATH
+
+_HASH_BLOCK = 1 << 20
+
+
+def sha256_file(path: Path) -> str:
+    """
+    Stream a file through SHA-256 and return the hex digest.
+    """
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(_HASH_BLOCK), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def sha256_text(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def config_digest(**params) -> str:
+    """
+    Stable hash of the settings a stage's output depends on.
+    """
+    return sha256_text(json.dumps(params, sort_keys=True, default=str))
+
+
+class Manifest:
+    """
+    Content-hash manifest for incremental corpus builds.
+
+    One entry per downloaded PDF, keyed by its path relative to
+    RAW_PDF_ROOT ("<keyword>/<file>.pdf"). Each entry stores the PDF hash
+    and, per stage, the hash of that stage's input plus what it produced:
+
+        {
+          "files": {
+            "Flood/file_1.pdf": {
+              "sha256":  "...",
+              "extract": {"input": "<pdf sha>", "config": "<mode>", "sha256": "<txt sha>" | null},
+              "minhash": {"input": "<txt sha>", "config": "<params>", "verdict": "unique" | "dup",
+                          "keeper": "<index key of the matched keeper, dups only>"},
+              "chunk":   {"input": "<txt sha>", "config": "<params>", "first_id": 17, "count": 4}
+            }
+          },
+          "stages": {"embed_dedup": {"input": "<sha of all chunk files>", "config": "<params>"}},
+          "last_chunk_id": 1234
+        }
+
+    A stage is up to date for a file when its recorded input hash and
+    config digest (see config_digest) both equal the current ones, so
+    only new or changed PDFs flow downstream, and changing a stage's
+    settings reruns that stage everywhere.
+    """
+    def __init__(self, path: Path = MANIFEST_PATH, fresh: bool = False):
+        self.path = Path(path)
+        self.data = {"files": {}, "stages": {}}
+        if self.path.exists() and not fresh:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.data = json.load(f)
+        self.data.setdefault("files", {})
+        self.data.setdefault("stages", {})
+
+    # ── keys
+    @staticmethod
+    def pdf_key(pdf_path: Path) -> str:
+        pdf_path = Path(pdf_path)
+        return f"{pdf_path.parent.name}/{pdf_path.name}"
+
+    @staticmethod
+    def txt_key(txt_path: Path) -> str:
+        """
+        Map an extracted/deduped .txt back to its PDF key
+        (PDFProcessor writes <keyword>/<stem>.pdf to <keyword>_txt/<stem>.txt).
+        """
+        txt_path = Path(txt_path)
+        folder = txt_path.parent.name
+        if folder.endswith("_txt"):
+            folder = folder[:-4]
+        return f"{folder}/{txt_path.stem}.pdf"
+
+    # ── per-file stages
+    def stage(self, key: str, stage: str) -> Optional[dict]:
+        return self.data["files"].get(key, {}).get(stage)
+
+    def is_current(self, key: str, stage: str, input_hash: str, config: str = "") -> bool:
+        rec = self.stage(key, stage)
+        return rec is not None and rec.get("input") == input_hash and rec.get("config", "") == config
+
+    def set_hash(self, key: str, digest: str) -> None:
+        self.data["files"].setdefault(key, {})["sha256"] = digest
+
+    def record(self, key: str, stage: str, input_hash: str, config: str = "", **info) -> None:
+        self.data["files"].setdefault(key, {})[stage] = {"input": input_hash, "config": config, **info}
+
+    def forget(self, key: str, stage: str) -> Optional[dict]:
+        return self.data["files"].get(key, {}).pop(stage, None)
+
+    def prune(self, live_keys: Iterable[str]) -> dict:
+        """
+        Drop entries whose PDF no longer exists; return the removed entries.
+        """
+        live = set(live_keys)
+        gone = {k: v for k, v in self.data["files"].items() if k not in live}
+        for k in gone:
+            del self.data["files"][k]
+        return gone
+
+    def keys_with(self, stage: str) -> list[str]:
+        return [k for k, v in self.data["files"].items() if stage in v]
+
+    # ── corpus-level stages and counters
+    def stage_is_current(self, stage: str, input_hash: str, config: str = "") -> bool:
+        rec = self.data["stages"].get(stage)
+        return rec is not None and rec.get("input") == input_hash and rec.get("config", "") == config
+
+    def record_stage(self, stage: str, input_hash: str, config: str = "", **info) -> None:
+        self.data["stages"][stage] = {"input": input_hash, "config": config, **info}
+
+    def get(self, name: str, default=None):
+        return self.data.get(name, default)
+
+    def set(self, name: str, value) -> None:
+        self.data[name] = value
+
+    def save(self) -> None:
+        """
+        Write atomically so an interrupted build never leaves a torn manifest.
+        """
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.data, f, ensure_ascii=False)
+        os.replace(tmp, self.path)
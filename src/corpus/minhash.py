@@ -0,0 +1,372 @@
+# src/corpus/minhash.py
+
+import hashlib
+import json
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import List, Sequence
+
+import numpy as np
+from datasketch import MinHash
+from datasketch.lsh import _optimal_param
+from transformers import GPT2TokenizerFast
+
+from configs.gen_config import MINHASH_THRESHOLD, MINHASH_PERM, MINHASH_HASH, MINHASH_WORKERS
+
+# datasketch constants (datasketch.minhash)
+_MERSENNE = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+
+NGRAM      = 3
+_ID_BITS   = 21                     # token ids packed 3 × 21 bits into one int64
+_ID_MASK   = (1 << _ID_BITS) - 1
+_ROW_BLOCK = 16384                  # grams per (grams × perms) block
+
+
+def _pack_ngrams(ids: np.ndarray) -> np.ndarray:
+    """
+    Unique token trigrams of one document, each packed into an int64.
+    """
+    if len(ids) < NGRAM:
+        return np.empty(0, dtype=np.int64)
+    grams = (ids[:-2] << (2 * _ID_BITS)) | (ids[1:-1] << _ID_BITS) | ids[2:]
+    return np.unique(grams)
+
+
+def _hash_sha1(grams: np.ndarray) -> np.ndarray:
+    """
+    Bit-identical to MinHash.update(str(tuple(gram)).encode()):
+    sha1_hash32 of the tuple repr, done once per unique trigram.
+    """
+    a = (grams >> (2 * _ID_BITS)).tolist()
+    b = ((grams >> _ID_BITS) & _ID_MASK).tolist()
+    c = (grams & _ID_MASK).tolist()
+    sha1 = hashlib.sha1
+    return np.fromiter(
+        (int.from_bytes(sha1(f"({x}, {y}, {z})".encode()).digest()[:4], "little")
+         for x, y, z in zip(a, b, c)),
+        dtype=np.uint64, count=len(grams),
+    )
+
+
+def _fmix64(x: np.ndarray) -> np.ndarray:
+    """
+    murmur3 64-bit finalizer, elementwise on a uint64 array (in place).
+    """
+    x ^= x >> np.uint64(33)
+    x *= np.uint64(0xFF51AFD7ED558CCD)
+    x ^= x >> np.uint64(33)
+    x *= np.uint64(0xC4CEB9FE1A85EC53)
+    x ^= x >> np.uint64(33)
+    return x
+
+
+def _hash_numpy(grams: np.ndarray) -> np.ndarray:
+    """
+    Vectorized 32-bit hash of packed trigrams.
+    Same signature space as _hash_sha1, different values.
+    """
+    return _fmix64(grams.astype(np.uint64)) & _MAX_HASH
+
+
+_HASHERS = {"sha1": _hash_sha1, "numpy": _hash_numpy}
+
+
+# per-worker engine, set once by the pool initializer
+_WORKER: "SignatureEngine | None" = None
+
+
+def _init_worker(engine: "SignatureEngine"):
+    global _WORKER
+    _WORKER = engine
+    _WORKER.tok     # load the tokenizer once per worker
+
+
+def _run_batch(paths: List[Path]) -> np.ndarray:
+    return _WORKER._sign_batch(paths)
+
+
+class SignatureEngine:
+    """
+    Batch MinHash signatures over GPT-2 token trigrams.
+
+    Signatures are uint64[num_perm] vectors in datasketch's format
+    (same permutations, prime and 32-bit range), so they plug into
+    MinHash(hashvalues=...) and MinHashLSH with MINHASH_THRESHOLD.
+    With hash_mode="sha1" they are bit-identical to the per-gram
+    MinHash.update loop; "numpy" swaps the trigram hash for a
+    vectorized one.
+    """
+    def __init__(
+        self,
+        num_perm:   int = MINHASH_PERM,
+        hash_mode:  str = MINHASH_HASH,
+        workers:    int = MINHASH_WORKERS,
+        batch_size: int = 64,
+    ):
+        if hash_mode not in _HASHERS:
+            raise ValueError(f"unknown MinHash hash mode {hash_mode!r}")
+        self.num_perm   = num_perm
+        self.hash_mode  = hash_mode
+        self.workers    = max(1, int(workers))
+        self.batch_size = batch_size
+        self.perms      = MinHash(num_perm=num_perm).permutations
+        self._tok       = None
+
+    def __getstate__(self):
+        # each worker loads its own tokenizer
+        state = self.__dict__.copy()
+        state["_tok"] = None
+        return state
+
+    @property
+    def tok(self):
+        if self._tok is None:
+            self._tok = GPT2TokenizerFast.from_pretrained("gpt2")
+        return self._tok
+
+    def minhash(self, signature: np.ndarray) -> MinHash:
+        return MinHash(num_perm=self.num_perm, hashvalues=signature, permutations=self.perms)
+
+    def from_ids(self, ids: Sequence[int]) -> np.ndarray:
+        """
+        Signature of one token-id sequence; permutations applied in bulk.
+        """
+        grams = _pack_ngrams(np.asarray(ids, dtype=np.int64))
+        sig = np.full(self.num_perm, _MAX_HASH, dtype=np.uint64)
+        if not len(grams):
+            return sig
+        hv = _HASHERS[self.hash_mode](grams)
+        a, b = self.perms
+        for s in range(0, len(hv), _ROW_BLOCK):
+            blk = hv[s:s + _ROW_BLOCK, None]
+            phv = (blk * a + b) % _MERSENNE & _MAX_HASH
+            np.minimum(sig, phv.min(axis=0), out=sig)
+        return sig
+
+    def from_texts(self, texts: List[str]) -> np.ndarray:
+        """
+        Signatures for a batch of texts, tokenized in one call.
+        """
+        out = np.empty((len(texts), self.num_perm), dtype=np.uint64)
+        if not texts:
+            return out
+        ids = self.tok(texts, add_special_tokens=False)["input_ids"]
+        for i, row in enumerate(ids):
+            out[i] = self.from_ids(row)
+        return out
+
+    def from_files(self, paths: List[Path]) -> np.ndarray:
+        """
+        Signatures for text files, in input order, across a process pool.
+        The engine (and its tokenizer) is set up once per worker; only
+        path batches and signatures cross the process boundary.
+        """
+        batches = [paths[i:i + self.batch_size] for i in range(0, len(paths), self.batch_size)]
+        if self.workers == 1 or len(batches) <= 1:
+            parts = [self._sign_batch(b) for b in batches]
+        else:
+            with ProcessPoolExecutor(
+                max_workers=self.workers,
+                initializer=_init_worker,
+                initargs=(self,),
+            ) as pool:
+                parts = list(pool.map(_run_batch, batches))
+        if not parts:
+            return np.empty((0, self.num_perm), dtype=np.uint64)
+        return np.concatenate(parts, axis=0)
+
+    def _sign_batch(self, paths: List[Path]) -> np.ndarray:
+        return self.from_texts([Path(p).read_text(encoding="utf-8") for p in paths])
+
+
+def _band_keys(sigs: np.ndarray, bands: int, rows: int) -> np.ndarray:
+    """
+    One 64-bit key per (band, doc): bands of `rows` consecutive hash
+    values, exactly the ranges MinHashLSH uses. Shape (bands, n).
+    """
+    x = np.asarray(sigs)[:, :bands * rows].astype(np.uint64).reshape(len(sigs), bands, rows)
+    h = np.zeros((len(sigs), bands), dtype=np.uint64)
+    for j in range(rows):
+        h = _fmix64((h << np.uint64(32)) ^ (h >> np.uint64(32)) ^ x[:, :, j])
+    return np.ascontiguousarray(h.T)
+
+
+class MinHashIndex:
+    """
+    Persistent MinHash LSH index over keeper (unique) documents.
+
+    Same banding as MinHashLSH(threshold, num_perm): a query matches a
+    document when any band of its signature collides. Documents live in
+    append-only segments on disk:
+
+        <root>/meta.json            params, segment list, dead rows
+        <root>/seg_XXXX/keys.json   document keys, row order
+        <root>/seg_XXXX/sigs.npy    uint32 (n, num_perm) signatures
+        <root>/seg_XXXX/bkeys.npy   uint64 (bands, n) band keys, sorted per band
+        <root>/seg_XXXX/brows.npy   int32  (bands, n) row of each sorted key
+
+    Arrays are opened memory-mapped and searched with searchsorted, so
+    loading is cheap and `save()` writes only what was added since the
+    last save. Removed documents are tombstoned until `compact()`.
+    """
+    def __init__(
+        self,
+        root:      Path,
+        threshold: float = MINHASH_THRESHOLD,
+        num_perm:  int   = MINHASH_PERM,
+        hash_mode: str   = MINHASH_HASH,
+        fresh:     bool  = False,
+    ):
+        self.root = Path(root)
+        if fresh:
+            shutil.rmtree(self.root, ignore_errors=True)
+        self.bands, self.rows = _optimal_param(threshold, num_perm, 0.5, 0.5)
+        params = {"threshold": threshold, "num_perm": num_perm, "hash_mode": hash_mode,
+                  "bands": self.bands, "rows": self.rows}
+
+        self.meta = {**params, "segments": [], "dead": {}, "next_seg": 1}
+        meta_fp = self.root / "meta.json"
+        if meta_fp.exists():
+            meta = json.loads(meta_fp.read_text(encoding="utf-8"))
+            if all(meta.get(k) == v for k, v in params.items()):
+                self.meta = meta
+            else:
+                print(f"MinHash index params changed → starting a new index in {self.root}")
+
+        self.segs = [self._open(name) for name in self.meta["segments"]]
+        self.where = {}   # key → (segment name, row) for live rows
+        for name, seg in zip(self.meta["segments"], self.segs):
+            dead = set(self.meta["dead"].get(name, ()))
+            for row, key in enumerate(seg["keys"]):
+                if row not in dead:
+                    self.where[key] = (name, row)
+
+        self._pending_keys: list[str] = []
+        self._pending_sigs: list[np.ndarray] = []
+        self._pending_bands: list[dict] = [dict() for _ in range(self.bands)]
+
+    def _open(self, name: str) -> dict:
+        d = self.root / name
+        return {
+            "keys":  json.loads((d / "keys.json").read_text(encoding="utf-8")),
+            "sigs":  np.load(d / "sigs.npy", mmap_mode="r"),
+            "bkeys": np.load(d / "bkeys.npy", mmap_mode="r"),
+            "brows": np.load(d / "brows.npy", mmap_mode="r"),
+        }
+
+    def __len__(self) -> int:
+        return len(self.where)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.where
+
+    def add(self, key: str, sig: np.ndarray) -> None:
+        """
+        Insert (or replace) a document signature.
+        """
+        self.remove(key)
+        row = len(self._pending_keys)
+        self._pending_keys.append(key)
+        self._pending_sigs.append(np.asarray(sig, dtype=np.uint32))
+        bkeys = _band_keys(np.asarray(sig)[None, :], self.bands, self.rows)[:, 0]
+        for band, bk in zip(self._pending_bands, bkeys.tolist()):
+            band.setdefault(bk, []).append(row)
+        self.where[key] = ("pending", row)
+
+    def remove(self, key: str) -> bool:
+        loc = self.where.pop(key, None)
+        if loc is None:
+            return False
+        name, row = loc
+        if name != "pending":
+            self.meta["dead"].setdefault(name, []).append(row)
+        return True
+
+    def query(self, sig: np.ndarray) -> list[str]:
+        """
+        Keys of live documents sharing at least one band with `sig`.
+        """
+        qkeys = _band_keys(np.asarray(sig)[None, :], self.bands, self.rows)[:, 0]
+        hits = set()
+        for name, seg in zip(self.meta["segments"], self.segs):
+            bkeys, brows = seg["bkeys"], seg["brows"]
+            for b, qk in enumerate(qkeys):
+                lo = np.searchsorted(bkeys[b], qk, side="left")
+                hi = np.searchsorted(bkeys[b], qk, side="right")
+                for row in brows[b, lo:hi].tolist():
+                    key = seg["keys"][row]
+                    if self.where.get(key) == (name, row):
+                        hits.add(key)
+        for band, qk in zip(self._pending_bands, qkeys.tolist()):
+            for row in band.get(qk, ()):
+                key = self._pending_keys[row]
+                if self.where.get(key) == ("pending", row):
+                    hits.add(key)
+        return sorted(hits)
+
+    def signature(self, key: str) -> np.ndarray:
+        name, row = self.where[key]
+        if name == "pending":
+            return self._pending_sigs[row].astype(np.uint64)
+        seg = self.segs[self.meta["segments"].index(name)]
+        return np.asarray(seg["sigs"][row], dtype=np.uint64)
+
+    def save(self) -> None:
+        """
+        Flush pending documents as a new segment and persist metadata.
+        """
+        self.root.mkdir(parents=True, exist_ok=True)
+        live = [(k, s) for row, (k, s) in enumerate(zip(self._pending_keys, self._pending_sigs))
+                if self.where.get(k) == ("pending", row)]
+        if live:
+            name = f"seg_{self.meta['next_seg']:04d}"
+            self.meta["next_seg"] += 1
+            keys = [k for k, _ in live]
+            self._write_segment(name, keys, np.stack([s for _, s in live]))
+            self.meta["segments"].append(name)
+            self.segs.append(self._open(name))
+            for row, key in enumerate(keys):
+                self.where[key] = (name, row)
+        self._pending_keys, self._pending_sigs = [], []
+        self._pending_bands = [dict() for _ in range(self.bands)]
+        self._write_meta()
+        if len(self.meta["segments"]) > 16:
+            self.compact()
+
+    def compact(self) -> None:
+        """
+        Merge all segments into one, dropping dead rows.
+        """
+        if self._pending_keys:
+            self.save()
+        keys = sorted(self.where)
+        sigs = np.stack([self.signature(k).astype(np.uint32) for k in keys]) if keys else \
+            np.empty((0, self.meta["num_perm"]), dtype=np.uint32)
+        old = list(self.meta["segments"])
+        name = f"seg_{self.meta['next_seg']:04d}"
+        self.meta["next_seg"] += 1
+        self._write_segment(name, keys, sigs)
+        self.meta["segments"], self.meta["dead"] = [name], {}
+        self.segs = [self._open(name)]
+        self.where = {k: (name, row) for row, k in enumerate(keys)}
+        self._write_meta()
+        for n in old:
+            shutil.rmtree(self.root / n, ignore_errors=True)
+
+    def _write_segment(self, name: str, keys: list[str], sigs: np.ndarray) -> None:
+        d = self.root / name
+        d.mkdir(parents=True, exist_ok=True)
+        bkeys = _band_keys(sigs, self.bands, self.rows)
+        order = np.argsort(bkeys, axis=1, kind="stable").astype(np.int32)
+        np.save(d / "sigs.npy", sigs.astype(np.uint32))
+        np.save(d / "bkeys.npy", np.take_along_axis(bkeys, order, axis=1))
+        np.save(d / "brows.npy", order)
+        (d / "keys.json").write_text(json.dumps(keys, ensure_ascii=False), encoding="utf-8")
+
+    def _write_meta(self) -> None:
+        tmp = self.root / "meta.json.tmp"
+        tmp.write_text(json.dumps(self.meta), encoding="utf-8")
+        os.replace(tmp, self.root / "meta.json")
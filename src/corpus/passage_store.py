@@ -0,0 +1,139 @@
+# src/corpus/passage_store.py
+
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Iterable, Iterator, List, Sequence
+
+import numpy as np
+from tqdm import tqdm
+
+BLOB_NAME    = "passages.bin"
+OFFSETS_NAME = "passages.offsets.npy"
+
+
+def _passage_text(item) -> str:
+    # deduped chunk files hold chunk dicts; older corpora plain strings
+    return (item["page_content"] if isinstance(item, dict) else item).strip()
+
+
+class PassageStore(Sequence[str]):
+    """
+    Read-only ordered corpus on disk: all passages as one contiguous
+    UTF-8 blob plus an int64 offsets array of length N + 1, both
+    memory-mapped.
+
+        <root>/passages.bin            passage i = blob[offsets[i]:offsets[i + 1]]
+        <root>/passages.offsets.npy
+
+    Opening is O(1) whatever the corpus size and `store[i]` decodes a
+    single passage. `store[lo:hi]` and `store.take(ids)` return lists of
+    strings; `store.view(lo, hi)` is a zero-copy sub-store over the same
+    maps. Passage ids are positions, as in the old ordered_corpus.json.
+    """
+    def __init__(self, root: Path, _maps=None, _span=None):
+        self.root = Path(root)
+        if _maps is None:
+            offsets = np.load(self.root / OFFSETS_NAME, mmap_mode="r")
+            size = (self.root / BLOB_NAME).stat().st_size
+            if size != offsets[-1]:
+                raise ValueError(f"{self.root}: blob is {size} bytes, offsets expect {offsets[-1]}")
+            blob = (np.memmap(self.root / BLOB_NAME, dtype=np.uint8, mode="r")
+                    if size else np.empty(0, dtype=np.uint8))
+            _maps, _span = (blob, offsets), (0, len(offsets) - 1)
+        self.blob, self.offsets = _maps
+        self.lo, self.hi = _span
+
+    @staticmethod
+    def exists(root: Path) -> bool:
+        return (Path(root) / OFFSETS_NAME).exists() and (Path(root) / BLOB_NAME).exists()
+
+    @classmethod
+    def build(cls, files: Iterable[Path], root: Path) -> "PassageStore":
+        """
+        Stream the passages of the chunk JSON `files`, in order, into a new
+        store under `root`, skipping empty ones. One file is in memory at a
+        time; both outputs are written to temporary names and swapped in,
+        offsets last, so a crash never leaves a readable partial store.
+        """
+        root = Path(root)
+        root.mkdir(parents=True, exist_ok=True)
+        blob_tmp = root / (BLOB_NAME + ".tmp")
+        offs_tmp = root / (OFFSETS_NAME + ".tmp.npy")
+
+        lengths: List[np.ndarray] = []
+        with open(blob_tmp, "wb") as out:
+            for fp in tqdm(list(files), desc="Building passage store"):
+                with open(fp, "r", encoding="utf-8") as f:
+                    raw = [_passage_text(item).encode("utf-8") for item in json.load(f)]
+                raw = [b for b in raw if b]
+                out.write(b"".join(raw))
+                lengths.append(np.fromiter(map(len, raw), dtype=np.int64, count=len(raw)))
+
+        offsets = np.zeros(sum(map(len, lengths)) + 1, dtype=np.int64)
+        if lengths:
+            np.cumsum(np.concatenate(lengths), out=offsets[1:])
+        np.save(offs_tmp, offsets)
+        os.replace(blob_tmp, root / BLOB_NAME)
+        os.replace(offs_tmp, root / OFFSETS_NAME)
+        print(f"built passage store {root} ({len(offsets) - 1:,d} passages, {offsets[-1] / 2**20:,.1f} MiB)")
+        return cls(root)
+
+    def is_current(self, files: Iterable[Path]) -> bool:
+        """
+        True if no file in `files` is newer than the store.
+        """
+        built = (self.root / OFFSETS_NAME).stat().st_mtime
+        return all(Path(fp).stat().st_mtime <= built for fp in files)
+
+    def fingerprint(self) -> str:
+        """
+        SHA-256 of the passage boundaries: changes whenever passages are
+        added, dropped, reordered or change length, e.g. on a rebuild
+        from other chunk files.
+        """
+        offs = np.asarray(self.offsets[self.lo:self.hi + 1]) - self.offsets[self.lo]
+        return hashlib.sha256(np.ascontiguousarray(offs, dtype="<i8").tobytes()).hexdigest()
+
+    def __len__(self) -> int:
+        return self.hi - self.lo
+
+    def _decode(self, i: int) -> str:
+        return self.blob[self.offsets[i]:self.offsets[i + 1]].tobytes().decode("utf-8")
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return self.take(range(len(self))[idx])
+        i = int(idx)
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(f"passage id {idx} out of range for {len(self)} passages")
+        return self._decode(self.lo + i)
+
+    def __iter__(self) -> Iterator[str]:
+        for i in range(self.lo, self.hi):
+            yield self._decode(i)
+
+    def take(self, ids) -> List[str]:
+        """
+        Passages for an array of ids. A contiguous run is read as one
+        slice of the blob and split in place.
+        """
+        ids = np.asarray(ids, dtype=np.int64).ravel()
+        if ids.size and (ids.min() < -len(self) or ids.max() >= len(self)):
+            raise IndexError(f"passage ids out of range for {len(self)} passages")
+        ids = np.where(ids < 0, ids + self.hi, ids + self.lo)
+        if ids.size > 1 and np.all(np.diff(ids) == 1):
+            offs = self.offsets[ids[0]:ids[-1] + 2] - self.offsets[ids[0]]
+            raw = self.blob[self.offsets[ids[0]]:self.offsets[ids[-1] + 1]].tobytes()
+            return [raw[a:b].decode("utf-8") for a, b in zip(offs[:-1], offs[1:])]
+        return [self._decode(i) for i in ids]
+
+    def view(self, start: int, stop: int) -> "PassageStore":
+        """
+        Zero-copy sub-store of passages [start, stop); ids restart at 0.
+        """
+        start, stop, _ = slice(start, stop).indices(len(self))
+        return PassageStore(self.root, (self.blob, self.offsets), (self.lo + start, self.lo + max(start, stop)))
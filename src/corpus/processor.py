@@ -1,89 +1,447 @@
 import re
+import signal
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from pathlib import Path
+
 import fitz
 import pandas as pd
-from pathlib import Path
 from tqdm import tqdm
 
 from configs.path_config import RAW_PDF_ROOT, TXT_ROOT
-from configs.gen_config    import TABLES_EXTRACT
+from configs.gen_config    import TABLES_EXTRACT, PDF_WORKERS, PDF_TIMEOUT_SEC
+from src.corpus.manifest   import Manifest, config_digest, sha256_file
 
 _LINE_RE     = re.compile(r"\s{2,}")
 _NUMERIC_RE  = re.compile(r"^\[\d.]+\$")
+_EDGE_OPS    = {"l", "re", "qu"}
+
+# every regex/substring line filter of Cleaner, fused into one pattern
+_GARBLE_TOKENS = ("....", "���", ". . .", "\x07", "…")
+_DROP_RE = re.compile("|".join([
+    *(re.escape(tok) for tok in _GARBLE_TOKENS),
+    _NUMERIC_RE.pattern.replace("^", r"^\s*", 1),   # _NUMERIC_RE on the stripped line
+    _LINE_RE.pattern,
+]))
+_REF_HEADINGS = {"reference", "references"}
+_KILL_GRACE_SEC = 5     # parent waits this long past the worker's own alarm
+
+
+class PDFTimeout(BaseException):
+    """
+    Raised when a single PDF exceeds its extraction budget.
+    Derives from BaseException so the broad ``except Exception``
+    around ``fitz.open`` cannot swallow it.
+    """
+
+
+def _on_alarm(signum, frame):
+    raise PDFTimeout()
+
+
+@contextmanager
+def _deadline(seconds: float):
+    """
+    Raise PDFTimeout in the current process after `seconds`.
+    The alarm fires between PyMuPDF calls, i.e. at the next block/page;
+    a hang inside a single MuPDF call is only caught by the parent's
+    hard deadline in PDFProcessor._map.
+    No-op when disabled, off the main thread, or without SIGALRM.
+    """
+    if (not seconds or not hasattr(signal, "SIGALRM")
+            or threading.current_thread() is not threading.main_thread()):
+        yield
+        return
+    prev = signal.signal(signal.SIGALRM, _on_alarm)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, prev)
+
+
+def _overlapping(blocks: list, table_bboxes: list) -> set[int]:
+    """
+    Indices of blocks whose bbox intersects any table bbox.
+
+    Sorted sweep on y: blocks are visited by top edge, tables enter the
+    active set once their top is above the tallest block bottom seen so
+    far and leave it once their bottom is above the current block top.
+    Only active tables get the exact Rect.intersects test.
+    """
+    tabs = sorted((fitz.Rect(t) for t in table_bboxes), key=lambda r: r.y0)
+    order = sorted(range(len(blocks)), key=lambda i: blocks[i][1])
+
+    hits: set[int] = set()
+    active: list = []
+    nxt, reach = 0, float("-inf")
+    for i in order:
+        rect = fitz.Rect(blocks[i][:4])
+        reach = max(reach, rect.y1)
+        while nxt < len(tabs) and tabs[nxt].y0 < reach:
+            active.append(tabs[nxt])
+            nxt += 1
+        active = [t for t in active if t.y1 > rect.y0]
+        if any(rect.intersects(t) for t in active):
+            hits.add(i)
+    return hits
+
+
+# per-worker processor, set once by the pool initializer
+_WORKER: "PDFProcessor | None" = None
+
+
+def _init_worker(processor: "PDFProcessor"):
+    global _WORKER
+    _WORKER = processor
+
+
+def _run_job(job: tuple[Path, Path]) -> tuple[str, int]:
+    pdf_path, out_dir = job
+    return _WORKER._process_timed(pdf_path, out_dir)
+
 
 class PDFProcessor:
     def __init__(
         self,
-        table_extract: bool = TABLES_EXTRACT,
-        txt_root:      Path = TXT_ROOT
+        table_extract: bool  = TABLES_EXTRACT,
+        txt_root:      Path  = TXT_ROOT,
+        workers:       int   = PDF_WORKERS,
+        timeout:       float = PDF_TIMEOUT_SEC,
+        cleaner:       "Cleaner | None" = None,
+        manifest:      Manifest | None  = None,
     ):
+        """
+        If `cleaner` is given, extraction output is streamed through
+        Cleaner line filtering before anything is written: only cleaned
+        text reaches disk and empty documents are never written.
+
+        If `manifest` is given, only PDFs that are new, changed, or whose
+        recorded output is missing are extracted; outputs of PDFs that
+        disappeared are removed.
+        """
         self.table_extract = table_extract
         self.txt_root       = Path(txt_root)
+        self.workers        = max(1, int(workers))
+        self.timeout        = timeout
+        self.cleaner        = cleaner
+        self.manifest       = manifest
+
+    def __getstate__(self):
+        # workers never touch the manifest; keep it out of the pickled state
+        state = self.__dict__.copy()
+        state["manifest"] = None
+        return state
 
-    def run(self, pdf_root: Path = RAW_PDF_ROOT):
+    def run(self, pdf_root: Path = RAW_PDF_ROOT) -> dict:
         """
         Iterate over all subfolders in pdf_root,
         extract text (and tables if enabled), write out .txt/.csv files.
+
+        PDFs are spread over `workers` processes; each output path depends
+        only on its input path, and results are collected in sorted input
+        order. Returns a throughput summary.
         """
-        pdf_root = Path(pdf_root)
-        for sub in tqdm(sorted(pdf_root.iterdir()), desc="PDF → TXT"):
+        jobs = self._collect_jobs(Path(pdf_root))
+        status = {"ok": 0, "failed": 0, "timeout": 0}
+        pages = 0
+
+        t0 = time.perf_counter()
+        inputs = {}
+        if self.manifest is not None:
+            jobs, inputs = self._pending(jobs)
+        config = self._config()
+
+        results = tqdm(self._map(jobs), total=len(jobs), desc="PDF → TXT")
+        for (pdf_path, out_dir), (state, n_pages) in zip(jobs, results):
+            status[state] += 1
+            pages += n_pages
+            if state == "ok" and self.manifest is not None:
+                txt_path = out_dir / f"{pdf_path.stem}.txt"
+                self.manifest.record(
+                    Manifest.pdf_key(pdf_path), "extract", inputs[pdf_path], config,
+                    sha256=sha256_file(txt_path) if txt_path.exists() else None,
+                )
+        if self.manifest is not None:
+            self.manifest.save()
+        elapsed = max(time.perf_counter() - t0, 1e-9)
+
+        summary = {
+            "files":     len(jobs),
+            "pages":     pages,
+            "seconds":   round(elapsed, 2),
+            "files_sec": round(len(jobs) / elapsed, 2),
+            "pages_sec": round(pages / elapsed, 2),
+            **status,
+        }
+        print(
+            f"Extracted {summary['files']} PDFs / {pages} pages in {elapsed:.1f}s "
+            f"({summary['files_sec']} files/s, {summary['pages_sec']} pages/s; "
+            f"workers={self.workers}, failed={status['failed']}, timeout={status['timeout']})"
+        )
+        return summary
+
+    def _collect_jobs(self, pdf_root: Path) -> list[tuple[Path, Path]]:
+        jobs = []
+        for sub in sorted(pdf_root.iterdir()):
             if not sub.is_dir():
                 continue
             out_dir = self.txt_root / f"{sub.name}_txt"
             out_dir.mkdir(parents=True, exist_ok=True)
             for pdf_file in sorted(sub.glob("*.pdf")):
-                self._process_single(pdf_file, out_dir)
+                jobs.append((pdf_file, out_dir))
+        return jobs
+
+    def _config(self) -> str:
+        return config_digest(clean=self.cleaner is not None, tables=self.table_extract)
 
-    def _process_single(self, pdf_path: Path, out_dir: Path):
+    def _pending(self, jobs: list[tuple[Path, Path]]) -> tuple[list, dict]:
+        """
+        Filter jobs down to PDFs whose extract stage is out of date.
+        The stage input is the PDF hash and its config the extraction
+        mode, so toggling cleaning or table extraction re-extracts
+        everything. Returns (pending jobs, {pdf_path: stage input hash}).
+        """
+        config = self._config()
+        pending, inputs, live = [], {}, []
+        for pdf_path, out_dir in tqdm(jobs, desc="Hashing PDFs"):
+            key = Manifest.pdf_key(pdf_path)
+            live.append(key)
+            digest = sha256_file(pdf_path)
+            self.manifest.set_hash(key, digest)
+
+            rec = self.manifest.stage(key, "extract")
+            txt_path = out_dir / f"{pdf_path.stem}.txt"
+            if self.manifest.is_current(key, "extract", digest, config):
+                if rec["sha256"] is None and not txt_path.exists():
+                    continue
+                if txt_path.exists() and sha256_file(txt_path) == rec["sha256"]:
+                    continue
+            pending.append((pdf_path, out_dir))
+            inputs[pdf_path] = digest
+
+        for key in self.manifest.prune(live):
+            folder, name = key.split("/", 1)
+            stale = self.txt_root / f"{folder}_txt" / Path(name).stem
+            for suffix in (".txt", ".csv"):
+                stale.with_suffix(suffix).unlink(missing_ok=True)
+
+        print(f"{len(pending)}/{len(jobs)} PDFs new or changed")
+        return pending, inputs
+
+    def _map(self, jobs: list[tuple[Path, Path]]):
+        """
+        Yield (status, pages) per job, in job order.
+
+        With a pool, at most `workers` jobs are in flight, so a job starts
+        when it is submitted and its deadline is enforced from here: a
+        worker still busy `timeout + _KILL_GRACE_SEC` seconds after its
+        job was submitted (stuck in a C call the alarm cannot interrupt)
+        is killed with the rest of the pool, its job counts as "timeout",
+        and the other in-flight jobs are resubmitted to a fresh pool.
+        A worker that dies takes the pool with it: every job in flight
+        then is retried once on its own, and counts as "failed" if it
+        breaks the pool again.
+        """
+        if self.workers == 1 or len(jobs) <= 1:
+            for pdf_path, out_dir in jobs:
+                yield self._process_timed(pdf_path, out_dir)
+            return
+
+        limit = self.timeout + _KILL_GRACE_SEC if self.timeout else None
+        results: dict[int, tuple[str, int]] = {}
+        running: dict = {}          # future → (job index, submit time)
+        crashes: dict[int, int] = {}
+        queue = list(range(len(jobs)))[::-1]
+        nxt = 0
+        pool = self._new_pool()
+        try:
+            while nxt < len(jobs):
+                while queue and len(running) < self.workers:
+                    if queue[-1] in crashes and running:
+                        break
+                    i = queue.pop()
+                    running[pool.submit(_run_job, jobs[i])] = (i, time.monotonic())
+                    if i in crashes:
+                        break       # suspects of a crash run alone
+
+                wait_for = None
+                if limit:
+                    oldest = min(t for _, t in running.values())
+                    wait_for = max(0.0, oldest + limit - time.monotonic())
+                finished, _ = wait(running, timeout=wait_for, return_when=FIRST_COMPLETED)
+
+                broken = False
+                for fut in finished:
+                    i, _ = running.pop(fut)
+                    try:
+                        results[i] = fut.result()
+                    except BrokenProcessPool:
+                        # a worker died (e.g. a crash inside MuPDF)
+                        broken = True
+                        crashes[i] = crashes.get(i, 0) + 1
+                        if crashes[i] < 2:
+                            queue.append(i)
+                            continue
+                        print(f"Failed to process {jobs[i][0]}: worker crashed")
+                        results[i] = ("failed", 0)
+                    except Exception as e:
+                        print(f"Failed to process {jobs[i][0]}: {e!r}")
+                        results[i] = ("failed", 0)
+
+                now = time.monotonic()
+                stuck = [f for f, (_, t) in running.items() if limit and now - t >= limit]
+                for fut in stuck:
+                    i, _ = running.pop(fut)
+                    print(f"Timed out after {self.timeout}s, killing worker: {jobs[i][0]}")
+                    results[i] = ("timeout", 0)
+                if stuck or broken:
+                    queue.extend(i for i, _ in running.values())
+                    queue.sort(reverse=True)
+                    running.clear()
+                    self._kill_pool(pool)
+                    pool = self._new_pool()
+
+                while nxt in results:
+                    yield results.pop(nxt)
+                    nxt += 1
+        finally:
+            self._kill_pool(pool)
+
+    def _new_pool(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            initializer=_init_worker,
+            initargs=(self,),
+        )
+
+    @staticmethod
+    def _kill_pool(pool: ProcessPoolExecutor):
+        """
+        Shut the pool down without waiting on its workers, killing any
+        that are still running a job.
+        """
+        for proc in list((pool._processes or {}).values()):
+            if proc.is_alive():
+                proc.kill()
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def _process_timed(self, pdf_path: Path, out_dir: Path) -> tuple[str, int]:
+        """
+        Process one PDF under the per-file deadline.
+        Returns (status, pages) where status is "ok", "failed" or "timeout".
+        """
+        try:
+            with _deadline(self.timeout):
+                return "ok", self._process_single(pdf_path, out_dir)
+        except PDFTimeout:
+            print(f"Timed out after {self.timeout}s: {pdf_path}")
+            return "timeout", 0
+        except Exception as e:
+            print(f"Failed to process {pdf_path}: {e}")
+            return "failed", 0
+
+    def _process_single(self, pdf_path: Path, out_dir: Path) -> int:
         txt_path = out_dir / f"{pdf_path.stem}.txt"
         csv_path = out_dir / f"{pdf_path.stem}.csv"
 
-        text = self._extract_pdf_content(pdf_path, csv_path)
-        txt_path.write_text(text, encoding="utf-8")
+        text, n_pages = self._extract_pdf_content(pdf_path, csv_path)
+        if self.cleaner is None:
+            txt_path.write_text(text, encoding="utf-8")
+        elif text.strip():
+            txt_path.write_text(text, encoding="utf-8")
+        elif txt_path.exists():
+            # stale output from an earlier run of a now-empty document
+            txt_path.unlink()
+        return n_pages
 
-    def _extract_pdf_content(self, pdf_path: Path, csv_path: Path) -> str:
+    def _extract_pdf_content(self, pdf_path: Path, csv_path: Path) -> tuple[str, int]:
+        """
+        Return (text, page count). With a cleaner attached the text is
+        already cleaned; the raw document text is never materialized.
+        A PDF that cannot be opened raises, so it counts as failed and is
+        retried on the next incremental run.
+        """
+        doc = fitz.open(pdf_path)
         try:
-            doc = fitz.open(pdf_path)
-        except Exception as e:
-            print(f"Failed to open PDF: {e}")
-            return ""
+            pieces = self._iter_text(doc, csv_path)
+            if self.cleaner is None:
+                text = "".join(pieces)
+            else:
+                text = self.cleaner.clean_stream(pieces)
+            return text, doc.page_count
+        finally:
+            doc.close()
 
-        full_text = ""
+    def _iter_text(self, doc, csv_path: Path):
+        """
+        Yield the document text piece by piece (block text, newline, ...),
+        writing any extracted tables to `csv_path` along the way.
+        """
         colnames0 = None
         rows      = []
 
         for page in doc:
-            blocks = page.get_text("blocks")
-            tables = page.find_tables() if self.table_extract else []
-
-            for b in blocks:
-                bbox, txt = b[:4], b[4]
-                # skip headers/footers and page numbers
-                if bbox[1] > page.rect.height * 0.9 or bbox[3] < page.rect.height * 0.1:
-                    if txt.strip().isdigit():
-                        continue
-                # avoid text overlapping table areas
-                if any(fitz.Rect(bbox).intersects(t.bbox) for t in tables):
-                    continue
-                full_text += txt + "\n"
-
-            if self.table_extract:
-                for tb in tables:
-                    hdr   = tb.header
-                    names = hdr.names
-                    if colnames0 is None:
-                        colnames0 = names
-                    elif names != colnames0:
-                        self._save_table(rows, colnames0, csv_path)
-                        rows, colnames0 = [], names
-                    extract = tb.extract()
-                    if not hdr.external:
-                        extract = extract[1:]  # drop duplicate header row
-                    rows.extend(extract)
+            tables = self._find_tables(page) if self.table_extract else []
+            yield from self._page_blocks(page, tables)
+
+            for tb in tables:
+                hdr   = tb.header
+                names = hdr.names
+                if colnames0 is None:
+                    colnames0 = names
+                elif names != colnames0:
+                    self._save_table(rows, colnames0, csv_path)
+                    rows, colnames0 = [], names
+                extract = tb.extract()
+                if not hdr.external:
+                    extract = extract[1:]  # drop duplicate header row
+                rows.extend(extract)
 
         if rows:
             self._save_table(rows, colnames0, csv_path)
-        doc.close()
-        return full_text
+
+    @staticmethod
+    def _page_blocks(page, tables: list) -> list[str]:
+        """
+        Return the page's text blocks (each followed by a newline),
+        dropping page numbers in the header/footer band and any block
+        that overlaps a table.
+        """
+        blocks = page.get_text("blocks")
+        height = page.rect.height
+        top, bottom = height * 0.1, height * 0.9
+        in_table = _overlapping(blocks, [t.bbox for t in tables]) if tables else ()
+
+        out = []
+        for i, b in enumerate(blocks):
+            txt = b[4]
+            # skip headers/footers and page numbers
+            if b[1] > bottom or b[3] < top:
+                if txt.strip().isdigit():
+                    continue
+            # avoid text overlapping table areas
+            if i in in_table:
+                continue
+            out.append(txt)
+            out.append("\n")
+        return out
+
+    @staticmethod
+    def _find_tables(page) -> list:
+        """
+        Run find_tables only on pages that carry ruling lines or boxes.
+        The default "lines" strategy builds cells from vector edges,
+        so a page without any line/rect paths cannot yield a table.
+        """
+        for path in page.get_cdrawings():
+            if any(item[0] in _EDGE_OPS for item in path["items"]):
+                return page.find_tables().tables
+        return []
 
     @staticmethod
     def _save_table(rows: list, cols: list, path: Path):
@@ -118,31 +476,40 @@ class Cleaner:
                     txt_file.unlink()
 
     def _clean(self, text: str) -> str:
+        return "\n".join(self._filter(text.splitlines()))
+
+    def clean_stream(self, pieces) -> str:
+        """
+        Clean text arriving as an iterable of pieces (e.g. extractor blocks).
+        Lines never span pieces, so the result equals _clean("".join(pieces)).
+        """
+        return "\n".join(self._filter(
+            ln for piece in pieces for ln in piece.splitlines()
+        ))
+
+    @staticmethod
+    def _filter(lines):
+        """
+        Streaming line filter: yield the lines that survive cleaning.
+        The input is always consumed to the end.
+        """
         in_refs = False
-        out_lines = []
-        for ln in text.splitlines():
+        for ln in lines:
+            if in_refs:
+                continue
             s = ln.strip()
             # detect start of references section
-            if s.lower() in {"reference", "references"}:
+            if s.lower() in _REF_HEADINGS:
                 in_refs = True
                 continue
-            if in_refs:
-                continue
-
-            # word/count heuristics
-            wc = len(s.split())
-            mwl = sum(len(w) for w in s.split()) / wc if wc else 0
 
-            # drop lines with common garble or punctuation artifacts
-            if any(tok in ln for tok in ("....", "���", ". . .", "\x07", "…")):
-                continue
-            if _NUMERIC_RE.match(s):
-                continue
-            if wc < 2 or mwl < 4:
-                continue
-            if _LINE_RE.search(ln):
+            # drop garble/punctuation artifacts, numeric tags, spaced-out columns
+            if _DROP_RE.search(ln):
                 continue
 
-            out_lines.append(ln)
+            # word/count heuristics: >= 2 words, mean word length >= 4
+            words = s.split()
+            if len(words) < 2 or sum(map(len, words)) < 4 * len(words):
+                continue
 
-        return "\n".join(out_lines)
+            yield ln
@@ -0,0 +1,102 @@
+# src/corpus/registry.py
+
+import json
+from collections import defaultdict
+from pathlib import Path
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+_DEFAULT_PORTS  = {"http": 80, "https": 443}
+_TRACKING_PARAM = ("utm_", "fbclid", "gclid")
+
+
+def normalize_url(url: str) -> str:
+    """
+    Canonical form of a URL for duplicate detection: lower-case scheme
+    and host, no default port, fragment or tracking parameters, sorted
+    query, and "http" folded into "https".
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    if scheme == "http":
+        scheme = "https"
+    host = (parts.hostname or "").lower()
+    if parts.port and parts.port != _DEFAULT_PORTS.get(parts.scheme.lower()):
+        host = f"{host}:{parts.port}"
+    query = sorted(
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if not k.lower().startswith(_TRACKING_PARAM)
+    )
+    return urlunsplit((scheme, host, parts.path or "/", urlencode(query), ""))
+
+
+class DownloadRegistry:
+    """
+    Global record of downloaded PDFs across keywords, as an append-only
+    JSON-lines log. One line per event:
+
+        {"path": "<pdf>", "url": "...", "sha256": "...", "keyword": "Flood"}
+        {"path": "<pdf>", "url": "...", "keyword": "Storm_surge", "ref": true}
+
+    The first is a download; the second says a keyword's search result
+    resolved to a PDF that is already on disk (same normalized URL or same
+    content), so it is associated with that keyword instead of being
+    downloaded and extracted again.
+
+    Entries of the older {path: url} JSON map are read as downloads whose
+    keyword is their folder name.
+    """
+    def __init__(self, log_path: Path, legacy_json: Path | None = None):
+        self.log_path = Path(log_path)
+        self.by_url:   dict[str, str] = {}
+        self.by_hash:  dict[str, str] = {}
+        self.keywords: dict[str, set[str]] = defaultdict(set)    # path → keywords
+        self.urls:     dict[str, set[str]] = defaultdict(set)    # keyword → urls
+
+        if legacy_json is not None and Path(legacy_json).exists():
+            with open(legacy_json, "r", encoding="utf-8") as f:
+                for path, url in json.load(f).items():
+                    self._apply({"path": path, "url": url})
+        if self.log_path.exists():
+            with open(self.log_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        self._apply(json.loads(line))
+                    except json.JSONDecodeError:
+                        continue    # torn last line of an interrupted run
+
+    def _apply(self, rec: dict) -> None:
+        path = rec["path"]
+        kw = rec.get("keyword") or Path(path).parent.name
+        self.by_url.setdefault(normalize_url(rec["url"]), path)
+        if rec.get("sha256"):
+            self.by_hash.setdefault(rec["sha256"], path)
+        self.keywords[path].add(kw)
+        self.urls[kw].add(rec["url"])
+
+    def _append(self, rec: dict) -> None:
+        self._apply(rec)
+        self.log_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.log_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+
+    @staticmethod
+    def _existing(path: str | None) -> Path | None:
+        return Path(path) if path is not None and Path(path).exists() else None
+
+    def path_for_url(self, url: str) -> Path | None:
+        return self._existing(self.by_url.get(normalize_url(url)))
+
+    def path_for_hash(self, digest: str) -> Path | None:
+        return self._existing(self.by_hash.get(digest))
+
+    def known_urls(self, keyword: str) -> set[str]:
+        """
+        URLs already resolved for `keyword` whose PDF is still on disk.
+        """
+        return {u for u in self.urls[keyword] if self.path_for_url(u) is not None}
+
+    def add(self, path: Path, url: str, digest: str, keyword: str) -> None:
+        self._append({"path": str(path), "url": url, "sha256": digest, "keyword": keyword})
+
+    def reference(self, path: Path, url: str, keyword: str) -> None:
+        self._append({"path": str(path), "url": url, "keyword": keyword, "ref": True})
@@ -0,0 +1,75 @@
+# src/corpus/search_cache.py
+
+import hashlib
+import os
+from pathlib import Path
+from typing import List, Tuple
+
+import numpy as np
+
+EMPTY = np.uint64(0)    # neighbour slot with no match
+
+
+def content_keys(texts: List[str]) -> np.ndarray:
+    """
+    64-bit content address of every text (first 8 bytes of its SHA-256).
+    """
+    sha = hashlib.sha256
+    return np.fromiter(
+        (int.from_bytes(sha(t.encode("utf-8")).digest()[:8], "little") for t in texts),
+        dtype=np.uint64, count=len(texts),
+    )
+
+
+class SearchCache:
+    """
+    Neighbour lists keyed by chunk content, one file per index version.
+
+    `root/<version>.npz` holds three aligned columns:
+        keys  uint64  (M,)     content key of the query chunk, sorted
+        nbrs  uint64  (M, k)   content keys of its neighbours (EMPTY = none)
+        sims  float32 (M, k)   their similarities
+
+    The version identifies whatever determines the neighbour lists
+    (backend, model, k, threshold), so changing any of them starts a new
+    cache instead of reusing wrong results. Adding, removing or reordering
+    chunk files leaves every other entry valid.
+    """
+    def __init__(self, root: Path, version: str, k: int):
+        self.path = Path(root) / f"{hashlib.sha256(version.encode()).hexdigest()[:16]}.npz"
+        self.k = k
+        self.keys = np.empty(0, dtype=np.uint64)
+        self.nbrs = np.empty((0, k), dtype=np.uint64)
+        self.sims = np.empty((0, k), dtype=np.float32)
+        if self.path.exists():
+            with np.load(self.path) as z:
+                self.keys, self.nbrs, self.sims = z["keys"], z["nbrs"], z["sims"]
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def lookup(self, keys: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Cached results for `keys`: (hit mask, neighbour keys, sims).
+        Rows of misses are EMPTY / 0.
+        """
+        nbrs = np.full((len(keys), self.k), EMPTY, dtype=np.uint64)
+        sims = np.zeros((len(keys), self.k), dtype=np.float32)
+        pos = np.searchsorted(self.keys, keys)
+        pos[pos == len(self.keys)] = 0
+        hit = (self.keys[pos] == keys) if len(self.keys) else np.zeros(len(keys), dtype=bool)
+        nbrs[hit] = self.nbrs[pos[hit]]
+        sims[hit] = self.sims[pos[hit]]
+        return hit, nbrs, sims
+
+    def save(self, keys: np.ndarray, nbrs: np.ndarray, sims: np.ndarray) -> None:
+        """
+        Replace the cache with the results of the current corpus, so
+        entries of removed chunks do not accumulate.
+        """
+        order = np.argsort(keys, kind="stable")
+        self.keys, self.nbrs, self.sims = keys[order], nbrs[order], sims[order]
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp.npz")
+        np.savez(tmp, keys=self.keys, nbrs=self.nbrs, sims=self.sims)
+        os.replace(tmp, self.path)
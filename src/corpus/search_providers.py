@@ -0,0 +1,194 @@
+# src/corpus/search_providers.py
+
+import asyncio
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+
+from configs.path_config import SEARCH_CACHE_DIR, SEARCH_LOCAL_FILE
+from configs.gen_config import (
+    GOOGLE_PAUSE_SEC,
+    HTTP_429_SLEEP_MIN,
+    SEARCH_PROVIDER,
+    SEARCH_RATE_PER_MIN,
+    SEARCH_CONCURRENCY,
+    SEARCH_TTL_DAYS,
+    SEARCH_EMPTY_TTL_HOURS,
+)
+
+
+class SearchError(Exception):
+    """
+    The provider could not answer; the result must not be cached.
+    """
+
+
+class RateLimited(SearchError):
+    """
+    The provider answered HTTP 429; every caller should back off.
+    """
+
+
+class GoogleProvider:
+    """
+    Live Google search through `googlesearch`, PDF-restricted.
+    A 429 is raised as RateLimited; CachedSearch owns the backoff.
+    """
+    name = "google"
+
+    def search(self, keyword: str) -> list[str]:
+        from googlesearch import search
+
+        query = f"{keyword} hazard pdf filetype:pdf"
+        try:
+            return list(search(query, num=10, stop=40, pause=GOOGLE_PAUSE_SEC))
+        except Exception as e:
+            if "429" in str(e):
+                raise RateLimited(e) from e
+            raise SearchError(e) from e
+
+
+class LocalFileProvider:
+    """
+    Offline provider: a JSON file mapping each keyword to its URL list,
+    e.g. saved from an earlier run or hand-written for tests.
+    """
+    name = "local"
+
+    def __init__(self, path: Path = SEARCH_LOCAL_FILE):
+        self.path = Path(path)
+        with open(self.path, "r", encoding="utf-8") as f:
+            self.results = json.load(f)
+
+    def search(self, keyword: str) -> list[str]:
+        return list(self.results.get(keyword, []))
+
+
+PROVIDERS = {"google": GoogleProvider, "local": LocalFileProvider}
+
+
+class TokenBucket:
+    """
+    Shared asyncio rate limit: `rate` tokens per second, bursts of `burst`.
+    `pause(seconds)` stops handing out tokens until then, for every caller.
+    """
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate   = rate
+        self.burst  = burst
+        self.tokens = float(burst)
+        self.stamp  = time.monotonic()
+        self.until  = 0.0
+        self.lock   = asyncio.Lock()
+
+    def pause(self, seconds: float) -> bool:
+        """
+        Hold all acquires for `seconds` from now; the bucket restarts
+        empty. False if an equal or longer pause was already in force.
+        """
+        until = time.monotonic() + seconds
+        if until <= self.until:
+            return False
+        self.until  = until
+        self.tokens = 0.0
+        return True
+
+    async def acquire(self) -> None:
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                if now < self.until:
+                    await asyncio.sleep(self.until - now)
+                    self.stamp = time.monotonic()
+                    continue
+                self.tokens = min(self.burst, self.tokens + (now - self.stamp) * self.rate)
+                self.stamp = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class CachedSearch:
+    """
+    Keyword → URL search behind a persistent on-disk cache.
+
+    Each answer is stored as SEARCH_CACHE_DIR/web/<provider>/<sha1>.json
+    with the time it was fetched. Answers are reused for `ttl_days`,
+    empty ones only for `empty_ttl_hours`, and failures are never cached.
+    Live calls run concurrently (at most `concurrency` at a time) under
+    one token bucket of `rate_per_min` calls per minute; cache hits skip
+    both limits. A 429 pauses the bucket for HTTP_429_SLEEP_MIN, so all
+    callers back off together, and the call is retried up to `retries`
+    times; nobody holds a search slot while waiting.
+    """
+    def __init__(
+        self,
+        provider=None,
+        cache_dir:       Path  = SEARCH_CACHE_DIR,
+        ttl_days:        float = SEARCH_TTL_DAYS,
+        empty_ttl_hours: float = SEARCH_EMPTY_TTL_HOURS,
+        rate_per_min:    float = SEARCH_RATE_PER_MIN,
+        concurrency:     int   = SEARCH_CONCURRENCY,
+        retries:         int   = 3,
+    ):
+        self.provider  = provider or PROVIDERS[SEARCH_PROVIDER]()
+        self.cache_dir = Path(cache_dir) / "web" / self.provider.name
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.ttl       = ttl_days * 86400
+        self.empty_ttl = empty_ttl_hours * 3600
+        self.rate      = rate_per_min / 60
+        self.concurrency = concurrency
+        self.retries   = retries
+        self.bucket = self.slots = None
+
+    def _path(self, keyword: str) -> Path:
+        return self.cache_dir / f"{hashlib.sha1(keyword.encode('utf-8')).hexdigest()}.json"
+
+    def cached(self, keyword: str) -> list[str] | None:
+        """
+        The cached URLs for `keyword`, or None if absent or expired.
+        """
+        path = self._path(keyword)
+        if not path.exists():
+            return None
+        rec = json.loads(path.read_text(encoding="utf-8"))
+        ttl = self.ttl if rec["urls"] else self.empty_ttl
+        if time.time() - rec["fetched_at"] > ttl:
+            return None
+        return rec["urls"]
+
+    def _store(self, keyword: str, urls: list[str]) -> None:
+        path = self._path(keyword)
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(
+            json.dumps({"keyword": keyword, "urls": urls, "fetched_at": time.time()}, ensure_ascii=False),
+            encoding="utf-8"
+        )
+        os.replace(tmp, path)
+
+    async def search(self, keyword: str) -> list[str]:
+        urls = self.cached(keyword)
+        if urls is not None:
+            return urls
+        if self.bucket is None:
+            # created lazily, inside the running event loop
+            self.bucket = TokenBucket(self.rate)
+            self.slots  = asyncio.Semaphore(self.concurrency)
+        for _ in range(self.retries):
+            await self.bucket.acquire()
+            async with self.slots:
+                try:
+                    urls = await asyncio.to_thread(self.provider.search, keyword)
+                except RateLimited:
+                    if self.bucket.pause(HTTP_429_SLEEP_MIN * 60):
+                        print(f"HTTP 429 – pausing searches for {HTTP_429_SLEEP_MIN} minutes...")
+                    continue
+                except SearchError as e:
+                    print(f"Search error for {keyword!r}: {e}")
+                    return []
+            self._store(keyword, urls)
+            return urls
+        print(f"Search error for {keyword!r}: still rate limited after {self.retries} attempts")
+        return []
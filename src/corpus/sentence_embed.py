@@ -0,0 +1,228 @@
+# src/corpus/sentence_embed.py
+
+import os
+import uuid
+from pathlib import Path
+from typing import List, Tuple
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from transformers import AutoTokenizer, AutoModel
+
+from src.utils.embed import embed_texts
+from src.corpus.search_cache import content_keys
+from configs.path_config import SENTENCE_CACHE_DIR
+from configs.gen_config import CHUNK_EMBED_MODEL
+from configs.model_config import (
+    MODEL_CONFIGS,
+    MODEL_CACHE_DIR,
+    DEFAULT_BATCH,
+    DEFAULT_MAXLEN,
+    DEVICE,
+    DTYPE,
+)
+
+_MAX_PARTS   = 16
+_FLUSH_EVERY = 65536    # pending vectors before a new part is written
+
+
+class EmbeddingCache:
+    """
+    Persistent sentence-embedding cache for one (model, max_len).
+
+    Stored as parts `part_<id>.keys.npy` (sorted uint64 sentence keys) and
+    `part_<id>.vecs.npy` (float32 rows), memory-mapped on load. New vectors
+    are buffered and written as a new part; parts are merged once there
+    are more than _MAX_PARTS. Part ids are unique per write (pid + uuid),
+    so chunker workers flushing at the same time never share a name.
+    """
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.parts: list[Tuple[np.ndarray, np.ndarray]] = []
+        self.names: set[str] = set()
+        self.pending: dict[int, np.ndarray] = {}
+        self.refresh()
+
+    def __getstate__(self):
+        # memory maps are reopened rather than pickled
+        return {"root": self.root}
+
+    def __setstate__(self, state):
+        self.__init__(state["root"])
+
+    def refresh(self) -> None:
+        """
+        Open parts written since this cache was loaded (e.g. by another process).
+        """
+        for kf in sorted(self.root.glob("part_*.keys.npy")):
+            if kf.name not in self.names:
+                try:
+                    self.parts.append(self._open(kf))
+                except FileNotFoundError:
+                    continue    # merged away by another process's compact()
+                self.names.add(kf.name)
+
+    @staticmethod
+    def _open(keys_file: Path) -> Tuple[np.ndarray, np.ndarray]:
+        vecs_file = keys_file.with_name(keys_file.name.replace(".keys.", ".vecs."))
+        return np.load(keys_file, mmap_mode="r"), np.load(vecs_file, mmap_mode="r")
+
+    def __len__(self) -> int:
+        return sum(len(k) for k, _ in self.parts) + len(self.pending)
+
+    def lookup(self, keys: np.ndarray) -> Tuple[np.ndarray, List[np.ndarray | None]]:
+        """
+        (hit mask, vectors) for `keys`; vectors of misses are None.
+        """
+        vecs = [self.pending.get(int(k)) for k in keys]
+        for pkeys, pvecs in self.parts:
+            todo = np.flatnonzero([v is None for v in vecs])
+            if not len(todo):
+                break
+            pos = np.searchsorted(pkeys, keys[todo]).clip(max=len(pkeys) - 1)
+            found = pkeys[pos] == keys[todo]
+            for i, p in zip(todo[found], pos[found]):
+                vecs[i] = pvecs[p]
+        return np.array([v is not None for v in vecs], dtype=bool), vecs
+
+    def put(self, keys: np.ndarray, vecs: np.ndarray) -> None:
+        for k, v in zip(keys.tolist(), vecs):
+            self.pending[k] = v
+        if len(self.pending) >= _FLUSH_EVERY:
+            self.save()
+
+    def save(self) -> None:
+        if not self.pending:
+            return
+        keys = np.fromiter(self.pending, dtype=np.uint64, count=len(self.pending))
+        vecs = np.stack(list(self.pending.values())).astype(np.float32)
+        self._write(self._new_part(), keys, vecs)
+        self.pending = {}
+        if len(self.parts) > _MAX_PARTS:
+            self.compact()
+
+    def compact(self) -> None:
+        """
+        Merge the parts this cache has open into one. Parts other
+        processes wrote since (or are writing) are left alone.
+        """
+        keys = np.concatenate([k for k, _ in self.parts])
+        vecs = np.concatenate([v for _, v in self.parts])
+        keys, first = np.unique(keys, return_index=True)
+        old = [self.root / n.replace(".keys.", f".{suffix}.")
+               for n in self.names for suffix in ("keys", "vecs")]
+        self.parts, self.names = [], set()
+        self._write(self._new_part(), keys, vecs[first])
+        for f in old:
+            f.unlink(missing_ok=True)
+
+    @staticmethod
+    def _new_part() -> str:
+        return f"part_{os.getpid()}_{uuid.uuid4().hex[:12]}"
+
+    def _write(self, name: str, keys: np.ndarray, vecs: np.ndarray) -> None:
+        # vecs first: a part counts only once its keys file exists. Both are
+        # mapped before being renamed into place, since another process may
+        # merge and delete the part right after.
+        order = np.argsort(keys)
+        maps = []
+        for suffix, arr in (("vecs", vecs[order]), ("keys", keys[order])):
+            tmp = self.root / f"{name}.{suffix}.tmp.npy"
+            np.save(tmp, arr)
+            maps.append(np.load(tmp, mmap_mode="r"))
+            os.replace(tmp, self.root / f"{name}.{suffix}.npy")
+        self.parts.append((maps[1], maps[0]))
+        self.names.add(f"{name}.keys.npy")
+
+
+class LocalSentenceEmbeddings(Embeddings):
+    """
+    LangChain Embeddings over a local MODEL_CONFIGS model via embed_texts,
+    behind an EmbeddingCache keyed by sentence hash. Needs no network once
+    the model is in MODEL_CACHE_DIR (set HF_HUB_OFFLINE=1 to enforce).
+
+    `prefetch` embeds the sentences of many documents in shared batches;
+    later `embed_documents` calls for those documents are cache hits.
+    """
+    def __init__(
+        self,
+        model_name: str = CHUNK_EMBED_MODEL,
+        cache_root: Path = SENTENCE_CACHE_DIR,
+        batch_size: int = DEFAULT_BATCH,
+        max_len:    int = DEFAULT_MAXLEN,
+        device:     str = DEVICE,
+        dtype            = DTYPE,
+    ):
+        if model_name not in MODEL_CONFIGS:
+            raise KeyError(f"{model_name} is not in MODEL_CONFIGS")
+        self.model_name = model_name
+        self.cfg        = MODEL_CONFIGS[model_name]
+        self.batch_size = batch_size
+        self.max_len    = max_len
+        self.device     = device
+        self.dtype      = dtype
+        self.cache      = EmbeddingCache(
+            Path(cache_root) / f"{model_name.replace('/', '__')}_len{max_len}"
+        )
+        self._model = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_model"] = None
+        return state
+
+    def _load(self):
+        if self._model is None:
+            tok = AutoTokenizer.from_pretrained(
+                self.model_name, trust_remote_code=True, cache_dir=MODEL_CACHE_DIR
+            )
+            mdl = AutoModel.from_pretrained(
+                self.model_name, trust_remote_code=True, cache_dir=MODEL_CACHE_DIR
+            ).to(self.device).eval()
+            self._model = (mdl, tok)
+        return self._model
+
+    def prefetch(self, texts: List[str]) -> np.ndarray:
+        """
+        Make sure every text is cached; return their keys.
+        Texts that fail to embed are not cached.
+        """
+        keys = content_keys(texts)
+        hit, _ = self.cache.lookup(keys)
+        if not hit.all():
+            self.cache.refresh()
+            hit, _ = self.cache.lookup(keys)
+        miss_keys, first = np.unique(keys[~hit], return_index=True)
+        if len(miss_keys):
+            miss_texts = [texts[i] for i in np.flatnonzero(~hit)[first]]
+            mdl, tok = self._load()
+            embs, valid = embed_texts(
+                mdl,
+                tok,
+                miss_texts,
+                max_len=self.max_len,
+                batch_size=self.batch_size,
+                pool_tag=self.cfg.get("pool", "cls"),
+                device=self.device,
+                dtype=self.dtype,
+                use_encode=self.cfg.get("use_encode", False),
+                desc="sentence-embed"
+            )
+            self.cache.put(miss_keys[valid], embs)
+        return keys
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        _, vecs = self.cache.lookup(self.prefetch(texts))
+        dim = next((len(v) for v in vecs if v is not None), 0)
+        # a text that failed to embed gets a zero vector (distance 1 to its neighbours)
+        return [
+            np.zeros(dim, dtype=np.float32).tolist() if v is None else np.asarray(v, dtype=np.float32).tolist()
+            for v in vecs
+        ]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+    def save(self) -> None:
+        self.cache.save()
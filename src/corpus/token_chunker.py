@@ -0,0 +1,127 @@
+# src/corpus/token_chunker.py
+
+from functools import lru_cache
+from typing import List, Tuple
+
+import numpy as np
+import tiktoken
+from langchain_core.documents import Document
+
+from configs.gen_config import (
+    PDF_MAX_CHUNK_TOKENS,
+    CHUNK_MIN_TOKENS,
+    CHUNK_TIKTOKEN_ENCODING,
+    CHUNK_WINDOW_OVERLAP,
+)
+
+_SENTENCE_ENDS = (b".", b"?", b"!")
+
+
+@lru_cache(maxsize=None)
+def _token_tables(encoding: str) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Per token id: its UTF-8 byte length, and whether a sentence may end
+    right after it (the token ends in . ? ! or contains a line break).
+    """
+    enc = tiktoken.get_encoding(encoding)
+    n = enc.n_vocab
+    nbytes = np.zeros(n, dtype=np.int64)
+    is_end = np.zeros(n, dtype=bool)
+    for i in range(n):
+        try:
+            b = enc.decode_single_token_bytes(i)
+        except KeyError:
+            continue
+        nbytes[i] = len(b)
+        is_end[i] = b.rstrip().endswith(_SENTENCE_ENDS) or b"\n" in b
+    return nbytes, is_end
+
+
+class TokenWindowChunker:
+    """
+    Fast alternative to SemanticChunker: fixed token windows over the
+    tiktoken encoding of a document, each snapped back to the last
+    sentence end that keeps it at least `min_tokens` long.
+
+    Works on token arrays: window ends are found with searchsorted over
+    the sentence-end positions, and chunk text is sliced from the
+    document's UTF-8 bytes via cumulative token byte lengths, so nothing
+    is decoded token by token. Same create_documents interface as the
+    LangChain splitter.
+    """
+    def __init__(
+        self,
+        encoding:   str = CHUNK_TIKTOKEN_ENCODING,
+        max_tokens: int = PDF_MAX_CHUNK_TOKENS,
+        min_tokens: int = CHUNK_MIN_TOKENS,
+        overlap:    int = CHUNK_WINDOW_OVERLAP,
+    ):
+        if not 0 <= overlap < min_tokens <= max_tokens:
+            raise ValueError("need 0 <= overlap < min_tokens <= max_tokens")
+        self.encoding   = encoding
+        self.enc        = tiktoken.get_encoding(encoding)
+        self.max_tokens = max_tokens
+        self.min_tokens = min_tokens
+        self.overlap    = overlap
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["enc"] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.enc = tiktoken.get_encoding(self.encoding)
+
+    def windows(self, tokens: np.ndarray) -> List[Tuple[int, int]]:
+        """
+        [start, end) token spans covering the document.
+        """
+        n = len(tokens)
+        if n < self.min_tokens:
+            return []
+        _, is_end = _token_tables(self.encoding)
+        # positions a chunk may end at (just after a sentence end), plus n
+        cuts = np.flatnonzero(is_end[tokens]) + 1
+        cuts = np.append(cuts[cuts < n], n)
+
+        spans, start = [], 0
+        while start < n:
+            hi = start + self.max_tokens
+            if hi >= n:
+                end = n
+            else:
+                j = np.searchsorted(cuts, hi, side="right") - 1
+                end = cuts[j] if j >= 0 and cuts[j] >= start + self.min_tokens else hi
+            spans.append((start, int(end)))
+            if end == n:
+                break
+            # next window starts at a sentence start inside the overlap
+            nxt = end - self.overlap
+            j = np.searchsorted(cuts, nxt, side="left")
+            start = int(cuts[j]) if self.overlap and cuts[j] < end else int(end)
+
+        # a short tail joins the previous window if it fits, else is dropped
+        if len(spans) > 1 and spans[-1][1] - spans[-1][0] < self.min_tokens:
+            _, e = spans.pop()
+            if e - spans[-1][0] <= self.max_tokens:
+                spans[-1] = (spans[-1][0], e)
+        return spans
+
+    def split_text(self, text: str) -> List[str]:
+        tokens = np.asarray(self.enc.encode_ordinary(text), dtype=np.int64)
+        spans = self.windows(tokens)
+        if not spans:
+            return []
+        nbytes, _ = _token_tables(self.encoding)
+        offs = np.concatenate(([0], np.cumsum(nbytes[tokens])))
+        raw = text.encode("utf-8")
+        chunks = []
+        for s, e in spans:
+            chunk = raw[offs[s]:offs[e]].decode("utf-8", errors="ignore").strip()
+            if chunk:
+                chunks.append(chunk)
+        return chunks
+
+    def create_documents(self, texts: List[str]) -> List[Document]:
+        return [Document(page_content=c) for text in texts for c in self.split_text(text)]
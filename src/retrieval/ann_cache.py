@@ -0,0 +1,54 @@
+# src/retrieval/ann_cache.py
+
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Iterator, Mapping
+
+from usearch.index import Index
+
+from configs.model_config import ANN_CACHE_MB
+
+
+class AnnIndexCache(Mapping[str, Index]):
+    """
+    Model name → usearch Index, opened on first use as a read-only
+    memory-mapped view of the saved index file (no load into RAM) and
+    kept in an LRU cache.
+
+    Open views are evicted, least recently used first, whenever their
+    file sizes add up to more than `budget_mb`; the one just requested is
+    always kept. With models used one after another, only the current
+    index stays mapped, so startup costs nothing and resident memory is
+    bounded by the largest index rather than the sum of all of them.
+    """
+    def __init__(self, paths: Dict[str, Path], budget_mb: int = ANN_CACHE_MB):
+        self.paths  = {name: Path(p) for name, p in paths.items()}
+        self.budget = budget_mb << 20
+        self.open:  "OrderedDict[str, Index]" = OrderedDict()
+        self.sizes: Dict[str, int] = {}
+
+    def __getitem__(self, model: str) -> Index:
+        if model in self.open:
+            self.open.move_to_end(model)
+            return self.open[model]
+        path = self.paths[model]
+        idx = Index.restore(str(path), view=True)
+        if idx is None:
+            raise FileNotFoundError(f"no usearch index at {path}")
+        self.open[model] = idx
+        self.sizes[model] = path.stat().st_size
+        while len(self.open) > 1 and sum(self.sizes[m] for m in self.open) > self.budget:
+            self.evict(next(iter(self.open)))
+        return idx
+
+    def evict(self, model: str) -> None:
+        """
+        Drop the view of `model`, if open; it is reopened on next use.
+        """
+        self.open.pop(model, None)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.paths)
+
+    def __len__(self) -> int:
+        return len(self.paths)
@@ -0,0 +1,78 @@
+# src/retrieval/exact_search.py
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Tuple
+
+import numpy as np
+import torch
+
+from configs.model_config import EXACT_BLOCK_MB, EXACT_THREADS, DEVICE
+
+
+def _topk_rows(ids: np.ndarray, scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Keep the k best columns of each row (unordered).
+    """
+    if scores.shape[1] <= k:
+        return ids, scores
+    part = np.argpartition(scores, -k, axis=1)[:, -k:]
+    return np.take_along_axis(ids, part, 1), np.take_along_axis(scores, part, 1)
+
+
+class BlockwiseExactSearch:
+    """
+    Exact inner-product top-k over a (possibly memory-mapped) (N, D)
+    embedding matrix, without ever holding the B×N similarity matrix or
+    a copy of the embeddings.
+
+    The corpus is scanned in blocks of about `block_mb` MiB. Each block is
+    scored against all queries with one torch matmul (multi-threaded on
+    CPU, or on the GPU), cut to its k best per query, and merged into the
+    running top-k with argpartition. `threads` blocks are in flight at
+    once, so reading the next block from the memmap overlaps scoring the
+    current one. Peak extra memory is about threads × (block + B × rows).
+    """
+    def __init__(
+        self,
+        embs:     np.ndarray,
+        block_mb: int = EXACT_BLOCK_MB,
+        threads:  int = EXACT_THREADS,
+        device:   str = DEVICE,
+    ):
+        self.embs       = embs
+        self.block_rows = max(1, (block_mb << 20) // (4 * max(1, embs.shape[1])))
+        self.threads    = max(1, threads)
+        self.device     = device
+
+    def _block(self, q: torch.Tensor, lo: int, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        blk = torch.from_numpy(np.array(self.embs[lo:lo + self.block_rows], dtype=np.float32))
+        with torch.no_grad():
+            # NaN rows (unembedded passages) never rank
+            scores = torch.nan_to_num(q @ blk.to(self.device).T, nan=-torch.inf)
+            scores, idx = scores.topk(min(k, len(blk)), dim=1)
+        return idx.cpu().numpy().astype(np.int64) + lo, scores.cpu().numpy()
+
+    def search(self, q_emb: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns (ids int64 (B, k), scores float32 (B, k)), best first;
+        k is capped at N. Slots left without a rankable row get id -1.
+        """
+        q = torch.as_tensor(np.atleast_2d(q_emb), dtype=torch.float32, device=self.device)
+        k = min(k, len(self.embs))
+
+        best_ids = np.empty((len(q), 0), dtype=np.int64)
+        best_scores = np.empty((len(q), 0), dtype=np.float32)
+        starts = range(0, len(self.embs), self.block_rows)
+        with ThreadPoolExecutor(self.threads) as pool:
+            for ids, scores in pool.map(lambda lo: self._block(q, lo, k), starts):
+                best_ids, best_scores = _topk_rows(
+                    np.concatenate([best_ids, ids], axis=1),
+                    np.concatenate([best_scores, scores], axis=1),
+                    k,
+                )
+
+        # best first; ties by lower id
+        order = np.lexsort((best_ids, -best_scores), axis=1)
+        ids, scores = np.take_along_axis(best_ids, order, 1), np.take_along_axis(best_scores, order, 1)
+        ids[np.isneginf(scores)] = -1
+        return ids, scores
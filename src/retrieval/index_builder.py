@@ -1,15 +1,21 @@
 # src/retrieval/index_builder.py
 
 import gc
+import hashlib
+import json
+import os
+import shutil
 from pathlib import Path
-from typing import Dict
+from typing import Dict, Sequence
 
 import numpy as np
 import torch
 from transformers import AutoTokenizer, AutoModel
+from tqdm import tqdm
 from usearch.index import Index
 
-from src.utils.embed         import embed_texts
+from src.utils.embed         import embed_texts, EmbedTimer
+from src.retrieval.ann_cache import AnnIndexCache
 from configs.path_config import BASELINE_INDEX_DIR
 from configs.model_config import (
     MODEL_CONFIGS,
@@ -18,20 +24,68 @@ from configs.model_config import (
     DEFAULT_MAXLEN,
     DEVICE,
     DTYPE,
+    ANN_BUILD_THREADS,
+    ANN_ADD_BATCH,
+    CORPUS_SHARD_ROWS,
+    EMBED_TOKEN_BUDGET,
+    EMBED_ADAPTIVE,
+    EMBED_PREFETCH,
 )
 
 
+def corpus_fingerprint(corpus: Sequence[str]) -> str:
+    """
+    Identity of a corpus: the store's offsets hash, or a hash of the
+    texts for an in-memory list.
+    """
+    if hasattr(corpus, "fingerprint"):
+        return corpus.fingerprint()
+    h = hashlib.sha256()
+    for text in corpus:
+        h.update(text.encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+def embs_fingerprint(embs: np.ndarray) -> str:
+    """
+    Identity of an embedding matrix: size and mtime of the file behind
+    a memmap (a re-encode rewrites it), else a hash of the values.
+    """
+    fn = getattr(embs, "filename", None)
+    if fn:
+        st = os.stat(fn)
+        return f"{Path(fn).name}:{st.st_size}:{st.st_mtime_ns}"
+    h = hashlib.sha256(str(embs.shape).encode())
+    for lo in range(0, len(embs), 65536):
+        h.update(np.ascontiguousarray(embs[lo:lo + 65536], dtype=np.float32).tobytes())
+    return h.hexdigest()
+
+
 class IndexBuilder:
     def __init__(
         self,
         cache_dir: str = BASELINE_INDEX_DIR,
         device: str = DEVICE,
-        dtype: torch.dtype = DTYPE
+        dtype: torch.dtype = DTYPE,
+        threads: int = ANN_BUILD_THREADS,
+        add_batch: int = ANN_ADD_BATCH,
+        shard_rows: int = CORPUS_SHARD_ROWS,
+        token_budget: int = EMBED_TOKEN_BUDGET,
+        adaptive: bool = EMBED_ADAPTIVE,
+        prefetch: int = EMBED_PREFETCH,
     ):
         self.cache = Path(cache_dir)
         self.cache.mkdir(parents=True, exist_ok=True)
         self.device = device
         self.dtype = dtype
+        self.threads = threads
+        self.add_batch = add_batch
+        self.shard_rows = shard_rows
+        self.token_budget = token_budget
+        self.adaptive = adaptive
+        self.prefetch = prefetch
+        self.timers: Dict[str, EmbedTimer] = {}
 
     def _emb_path(self, model_name: str) -> Path:
         fn = model_name.replace("/", "_") + ".fp32.npy"
@@ -41,45 +95,160 @@ class IndexBuilder:
         fn = model_name.replace("/", "_") + ".usearch"
         return self.cache / fn
 
+    @staticmethod
+    def _meta_path(fp: Path) -> Path:
+        # <x>.fp32.npy → <x>.fp32.json, <x>.usearch → <x>.usearch.json
+        return fp.with_name(fp.name.removesuffix(".npy") + ".json")
+
+    @staticmethod
+    def _read_meta(fp: Path) -> Dict:
+        return json.loads(fp.read_text()) if fp.exists() else {}
+
+    def _shard_dir(self, model_name: str) -> Path:
+        return self.cache / (model_name.replace("/", "_") + ".shards")
+
+    def _load_model(self, model_name: str):
+        tok = AutoTokenizer.from_pretrained(
+            model_name, trust_remote_code=True, cache_dir=MODEL_CACHE_DIR
+        )
+        mdl = AutoModel.from_pretrained(
+            model_name, trust_remote_code=True, cache_dir=MODEL_CACHE_DIR
+        ).to(self.device).eval()
+        return tok, mdl
+
     def corpus_embedding(
         self,
         model_name: str,
         cfg: Dict,
-        corpus: list[str],
+        corpus: Sequence[str],
         rebuild: bool = False,
     ) -> np.ndarray:
+        """
+        The (N, D) float32 corpus embeddings of `model_name`, as a memmap.
+
+        Rows are encoded in fixed shards of `shard_rows` passages, each saved
+        to <model>.shards/shard_XXXXX.npy as soon as it is done, so a rerun
+        resumes after the last complete shard. Once all shards exist they
+        are concatenated into <model>.fp32.npy and removed.
+
+        Row i is always passage i. Passages that cannot be embedded, even
+        alone, are NaN rows and are listed in <model>.unembedded.json.
+
+        The corpus fingerprint is kept in <model>.fp32.json and in the shard
+        meta; embeddings or shards of another corpus are encoded again.
+        """
         emb_fp = self._emb_path(model_name)
+        meta_fp = self._meta_path(emb_fp)
+        corpus_fp = corpus_fingerprint(corpus)
         if emb_fp.exists() and not rebuild:
-            return np.load(emb_fp, mmap_mode="r")
+            embs = np.load(emb_fp, mmap_mode="r")
+            recorded = self._read_meta(meta_fp).get("corpus")
+            if recorded == corpus_fp:
+                return embs
+            if recorded is None and len(embs) == len(corpus):
+                # written before fingerprints were recorded: adopt it
+                meta_fp.write_text(json.dumps({"corpus": corpus_fp}))
+                return embs
+            print(f"→ {emb_fp.name} was encoded from another corpus, re-encoding")
+            del embs
 
-        print(f"→ encoding corpus with {model_name}")
-        tok = AutoTokenizer.from_pretrained(
-            model_name, trust_remote_code=True, cache_dir=MODEL_CACHE_DIR
-        )
-        mdl = AutoModel.from_pretrained(
-            model_name, trust_remote_code=True, cache_dir=MODEL_CACHE_DIR
-        ).to(self.device).eval()
+        shard_dir = self._shard_dir(model_name)
+        meta = {"rows": len(corpus), "shard_rows": self.shard_rows, "corpus": corpus_fp}
+        shard_meta = shard_dir / "meta.json"
+        if shard_dir.exists() and (rebuild or self._read_meta(shard_meta) != meta):
+            shutil.rmtree(shard_dir)    # other corpus or shard size
+        shard_dir.mkdir(parents=True, exist_ok=True)
+        shard_meta.write_text(json.dumps(meta))
 
-        embs, _ = embed_texts(
-            mdl,
-            tok,
-            corpus,
-            max_len=DEFAULT_MAXLEN,
-            batch_size=DEFAULT_BATCH,
-            pool_tag=cfg.get("pool", "cls"),
-            device=self.device,
-            dtype=self.dtype,
-            use_encode=cfg.get("use_encode", False),
-            desc=f"{model_name}-corpus"
-        )
-        embs = embs.astype(np.float32)
-        np.save(emb_fp, embs)
+        starts = range(0, len(corpus), self.shard_rows)
+        shards = [shard_dir / f"shard_{i:05d}.npy" for i in range(len(starts))]
+        todo = [i for i, fp in enumerate(shards) if not fp.exists()]
+        if todo:
+            print(f"→ encoding corpus with {model_name}: {len(todo)}/{len(shards)} shards to go")
+            tok, mdl = self._load_model(model_name)
+            timer = self.timers.setdefault(model_name, EmbedTimer())
+            for i in todo:
+                lo = starts[i]
+                texts = corpus[lo:lo + self.shard_rows]
+                embs, valid = embed_texts(
+                    mdl,
+                    tok,
+                    texts,
+                    max_len=DEFAULT_MAXLEN,
+                    batch_size=DEFAULT_BATCH,
+                    pool_tag=cfg.get("pool", "cls"),
+                    device=self.device,
+                    dtype=self.dtype,
+                    use_encode=cfg.get("use_encode", False),
+                    desc=f"{model_name}-shard{i}/{len(shards)}",
+                    token_budget=self.token_budget,
+                    adaptive=self.adaptive,
+                    prefetch=self.prefetch,
+                    stats=timer,
+                )
+                # rows stay aligned with passage ids: a passage that cannot be
+                # embedded is a NaN row and is recorded next to the shard
+                shard = np.full((len(texts), embs.shape[1]), np.nan, dtype=np.float32)
+                shard[np.asarray(valid, dtype=np.int64)] = embs
+                missing = np.setdiff1d(np.arange(len(texts)), valid) + lo
+                if len(missing):
+                    print(f"[WARN] {model_name}: {len(missing)} passages not embedded in shard {i}")
+                    self._missing_path(shards[i]).write_text(json.dumps(missing.tolist()))
+                tmp = shards[i].with_suffix(".tmp.npy")
+                np.save(tmp, shard)
+                os.replace(tmp, shards[i])
+
+            del mdl, tok
+            torch.cuda.empty_cache()
+            gc.collect()
+            print(f"   {model_name}: {timer.summary()}")
+
+        self._concat(shards, emb_fp)
+        meta_fp.write_text(json.dumps({"corpus": corpus_fp}))
+        missing = [i for fp in shards if self._missing_path(fp).exists()
+                   for i in json.loads(self._missing_path(fp).read_text())]
+        self._record_unembedded(model_name, missing)
+        shutil.rmtree(shard_dir)
+        return np.load(emb_fp, mmap_mode="r")
+
+    @staticmethod
+    def _missing_path(shard: Path) -> Path:
+        return shard.with_suffix(".missing.json")
 
-        del mdl, tok
-        torch.cuda.empty_cache()
-        gc.collect()
+    def _unembedded_path(self, model_name: str) -> Path:
+        return self.cache / (model_name.replace("/", "_") + ".unembedded.json")
 
-        return embs
+    def _record_unembedded(self, model_name: str, ids: list[int]):
+        """
+        <model>.unembedded.json lists the passage ids the model could not
+        embed (NaN rows, left out of its ANN index); absent if none.
+        """
+        fp = self._unembedded_path(model_name)
+        if ids:
+            fp.write_text(json.dumps({"model": model_name, "ids": sorted(ids)}))
+            print(f"[WARN] {model_name}: {len(ids)} unembeddable passages recorded in {fp.name}")
+        else:
+            fp.unlink(missing_ok=True)
+
+    @staticmethod
+    def _concat(shards: list[Path], out_fp: Path):
+        """
+        Stream the shards, in order, into one .npy file.
+        """
+        parts = [np.load(fp, mmap_mode="r") for fp in shards]
+        dim = max((p.shape[1] for p in parts), default=0)
+        tmp = out_fp.with_suffix(".tmp.npy")
+        out = np.lib.format.open_memmap(
+            tmp, mode="w+", dtype=np.float32, shape=(sum(len(p) for p in parts), dim)
+        )
+        lo = 0
+        for p in parts:
+            # a shard with no embedded passage at all has no width
+            out[lo:lo + len(p)] = p if p.shape[1] == dim else np.nan
+            lo += len(p)
+        out.flush()
+        del out
+        os.replace(tmp, out_fp)
 
     def ann_index(
         self,
@@ -89,37 +258,104 @@ class IndexBuilder:
     ) -> Index:
         """
         Build (or load) an ANN index for the given embeddings.
+
+        Rows are added in batches of `add_batch` on `threads` threads. After
+        each batch the index is checkpointed to `<index>.partial`, so an
+        interrupted build resumes from the last saved row: keys are row
+        numbers, added in order, so everything up to the largest key is done.
+        NaN rows (passages the model could not embed) are left out.
+
+        <index>.json records the fingerprint of the embeddings the index (or
+        its checkpoint) is built from; an index of other embeddings, or one
+        without that record, is rebuilt.
         """
         idx_fp = self._idx_path(model_name)
-        if idx_fp.exists() and not rebuild:
+        if not rebuild and self.index_is_current(model_name, embs):
             return Index.restore(str(idx_fp))
 
-        idx = Index(
-            ndim=embs.shape[1],
-            metric="ip",
-            dtype="f32",
-            connectivity=16,
-            expansion_add=128,
-            expansion_search=64
-        )
+        meta_fp = self._meta_path(idx_fp)
+        meta = {"embs": embs_fingerprint(embs)}
+        part_fp = idx_fp.with_suffix(".partial")
+        if part_fp.exists() and (rebuild or self._read_meta(meta_fp) != meta):
+            part_fp.unlink()
+        meta_fp.write_text(json.dumps(meta))
+        start = 0
+        if part_fp.exists():
+            idx = Index.restore(str(part_fp))
+            start = int(np.asarray(idx.keys).max()) + 1 if len(idx) else 0
+            print(f"→ resuming {idx_fp.name} at row {start:,d}/{len(embs):,d}")
+        else:
+            idx = Index(
+                ndim=embs.shape[1],
+                metric="ip",
+                dtype="f32",
+                connectivity=16,
+                expansion_add=128,
+                expansion_search=64
+            )
 
-        idx.add(np.arange(len(embs), dtype=np.int64), embs, copy=True, threads=1)
-        idx.save(str(idx_fp))
+        with tqdm(total=len(embs), initial=start, desc=f"{model_name}-ann", unit="row") as bar:
+            for lo in range(start, len(embs), self.add_batch):
+                hi = min(lo + self.add_batch, len(embs))
+                vecs = np.ascontiguousarray(embs[lo:hi], dtype=np.float32)
+                ok = ~np.isnan(vecs).any(axis=1)
+                keys = np.arange(lo, hi, dtype=np.int64)
+                if ok.any():
+                    idx.add(keys[ok], vecs[ok], copy=True, threads=self.threads)
+                if hi < len(embs):
+                    self._save(idx, part_fp)
+                bar.update(hi - lo)
+
+        self._save(idx, idx_fp)
+        meta_fp.write_text(json.dumps({**meta, "complete": True}))
+        part_fp.unlink(missing_ok=True)
         return idx
 
-    def build_all(self, corpus: list[str]) -> tuple[np.ndarray, Dict[str, Index]]:
+    def index_is_current(self, model_name: str, embs: np.ndarray) -> bool:
         """
-        For all models in MODEL_CONFIGS, compute corpus embeddings once
-        and build ANN indices reusing the same embeddings.
-        Returns (embeddings, {model_name: Index}).
+        True if the saved index of `model_name` was built from `embs`.
         """
-        ann_idxs: Dict[str, Index] = {}
-        base_embs = None
+        idx_fp = self._idx_path(model_name)
+        meta = self._read_meta(self._meta_path(idx_fp))
+        return idx_fp.exists() and meta.get("complete", False) and meta.get("embs") == embs_fingerprint(embs)
+
+    @staticmethod
+    def _save(idx: Index, path: Path):
+        tmp = path.with_suffix(".tmp")
+        idx.save(str(tmp))
+        os.replace(tmp, path)
 
+    def build_all(self, corpus: Sequence[str]) -> tuple[Dict[str, np.ndarray], AnnIndexCache]:
+        """
+        For every model in MODEL_CONFIGS, compute (or resume) its own
+        corpus embeddings and build its ANN index from them if missing or
+        built from other embeddings; each freshly built index is released
+        once saved.
+        Returns ({model_name: embeddings memmap}, AnnIndexCache), the cache
+        opening every index lazily as a memory-mapped view.
+        """
+        corpus_embs: Dict[str, np.ndarray] = {}
         for name, cfg in MODEL_CONFIGS.items():
-            if base_embs is None:
-                base_embs = self.corpus_embedding(name, cfg, corpus)
-            # build or load ANN index
-            ann_idxs[name] = self.ann_index(name, base_embs)
+            corpus_embs[name] = self.corpus_embedding(name, cfg, corpus)
+            if not self.index_is_current(name, corpus_embs[name]):
+                self.ann_index(name, corpus_embs[name])
+
+        self._report_timing()
+        return corpus_embs, AnnIndexCache({name: self._idx_path(name) for name in MODEL_CONFIGS})
 
-        return base_embs, ann_idxs
+    def _report_timing(self):
+        """
+        Tokenization vs model time per model encoded in this run, printed
+        and merged into embed_timing.json in the cache dir.
+        """
+        if not self.timers:
+            return
+        fp = self.cache / "embed_timing.json"
+        report = json.loads(fp.read_text()) if fp.exists() else {}
+        print(f"{'model':<45} {'tokenize s':>10} {'waited s':>9} {'model s':>9} {'tokens/s':>10}")
+        for name, timer in self.timers.items():
+            t = timer.totals
+            report[name] = t
+            print(f"{name:<45} {t.get('tokenize_s', 0):10.1f} {t.get('wait_s', 0):9.1f} "
+                  f"{t.get('model_s', 0):9.1f} {t.get('tokens', 0) / max(t.get('model_s', 0), 1e-9):10.0f}")
+        fp.write_text(json.dumps(report, indent=2))
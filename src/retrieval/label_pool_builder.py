@@ -1,13 +1,32 @@
 # src/retrieval/label_pool_builder.py
 
 import json
+import os
 from pathlib import Path
+from typing import Dict, List, Sequence
 import numpy as np
 from filelock import FileLock
 
+from configs.model_config import MODEL_CONFIGS
 from src.utils.io import load_test_file
 
 class LabelPoolBuilder:
+    """
+    Per query file, `<stem>_label_pool.json`: the query records, each
+    extended with passage ids and scores rather than passage text:
+
+        "baseline_results": {"<model>_exact": {"ids": [...], "scores": [...]},
+                             "<model>_ann":   {"ids": [...], "scores": [...]}},
+        "label_pool": [<passage id>, ...]
+
+    Ids index the PassageStore; text is resolved only when needed
+    (scoring, or `export_text` for the older all-text JSON view).
+    Models accumulate in the file as they are built; the pool is the
+    union of all their hits in first-seen order. Records always come
+    from the current query file: runs of other models are carried over
+    from the existing file by query text, and only for models still in
+    MODEL_CONFIGS.
+    """
 
     def __init__(self, out_dir: str, query_emb_dir: str):
         self.out_dir       = Path(out_dir)
@@ -22,6 +41,33 @@ class LabelPoolBuilder:
                 seen.add(x)
         return uniq
 
+    def _out_path(self, query_json: str) -> Path:
+        return self.out_dir / f"{Path(query_json).stem}_label_pool.json"
+
+    @staticmethod
+    def _run(ids: np.ndarray, scores: np.ndarray) -> Dict[str, List]:
+        keep = ids >= 0
+        return {
+            "ids":    ids[keep].tolist(),
+            "scores": np.round(scores[keep].astype(np.float64), 6).tolist(),
+        }
+
+    @staticmethod
+    def _previous_runs(out_fp: Path) -> Dict[str, Dict]:
+        """
+        user_query → baseline_results of the existing pool file, keeping
+        only id-format runs of models in MODEL_CONFIGS.
+        """
+        if not out_fp.exists():
+            return {}
+        runs = {}
+        for d in json.load(open(out_fp, encoding="utf-8")):
+            runs.setdefault(d.get("user_query", "").strip(), {
+                k: run for k, run in d.get("baseline_results", {}).items()
+                if isinstance(run, dict) and k.rpartition("_")[0] in MODEL_CONFIGS
+            })
+        return runs
+
     def build_for_file(self, query_json: str, model: str, retriever):
         stem = Path(query_json).stem
         slug = model.replace("/", "_")
@@ -31,22 +77,52 @@ class LabelPoolBuilder:
             return
 
         q_emb = np.load(str(q_emb_fp))
-        results = retriever.retrieve(model, q_emb)
-
-        data, _ = load_test_file(query_json)
-        for i, d in enumerate(data):
-            d.setdefault("baseline_results", {})
-            d["baseline_results"].setdefault(f"{model}_exact", results["exact"][i])
-            d["baseline_results"].setdefault(f"{model}_ann",   results["ann"][i])
-            d.setdefault("label_pool", [])
-            d["label_pool"].extend(results["exact"][i])
-            d["label_pool"].extend(results["ann"][i])
-            d["label_pool"] = self._dedup(d["label_pool"])
-
-        out_fp = self.out_dir / f"{stem}_label_pool.json"
+        data, queries = load_test_file(query_json)
+        if len(q_emb) != len(queries):
+            print(f"[WARN] {q_emb_fp} has {len(q_emb)} rows for {len(queries)} queries in {stem}; "
+                  "re-embed the queries")
+            return
+        results = retriever.retrieve_ids(model, q_emb)
+        (ex_ids, ex_scores), (ann_ids, ann_scores) = results["exact"], results["ann"]
+
+        out_fp = self._out_path(query_json)
         lock_fp = Path(str(out_fp) + ".lock")
         with FileLock(str(lock_fp)):
-            with open(out_fp, "w", encoding="utf-8") as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
+            previous = self._previous_runs(out_fp)
+            for i, (d, q) in enumerate(zip(data, queries)):
+                exact = self._run(ex_ids[i], ex_scores[i])
+                ann   = self._run(ann_ids[i], ann_scores[i])
+                # text-format runs of an older build are dropped and rebuilt
+                d["baseline_results"] = dict(previous.get(q, {}))
+                d["baseline_results"][f"{model}_exact"] = exact
+                d["baseline_results"][f"{model}_ann"]   = ann
+                d["label_pool"] = self._dedup(
+                    pid for run in d["baseline_results"].values() for pid in run["ids"]
+                )
+
+            tmp = out_fp.with_suffix(".tmp")
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp, out_fp)
 
         print(f"wrote {out_fp.name}")
+
+    @staticmethod
+    def export_text(pool_json: str, corpus: Sequence[str], out_fp: str):
+        """
+        Write the all-text view of an id label pool: every id in
+        baseline_results and label_pool replaced by its passage, as in
+        the original label pool format.
+        """
+        data = json.load(open(pool_json, encoding="utf-8"))
+        ids = sorted({i for d in data for i in d.get("label_pool", [])})
+        text = dict(zip(ids, corpus.take(ids) if hasattr(corpus, "take") else [corpus[i] for i in ids]))
+        for d in data:
+            for key, run in d.get("baseline_results", {}).items():
+                d["baseline_results"][key] = [text[i] for i in run["ids"]]
+            d["label_pool"] = [text[i] for i in d.get("label_pool", [])]
+
+        Path(out_fp).parent.mkdir(parents=True, exist_ok=True)
+        with open(out_fp, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        print(f"exported {Path(out_fp).name}")
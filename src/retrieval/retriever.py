@@ -1,76 +1,112 @@
 # src/retrieval/retriever.py
 
-from typing import Dict, List
+from typing import Dict, List, Mapping, Sequence, Tuple
 import numpy as np
-import torch
 from usearch.index import Index
 
-from configs.model_config import DEFAULT_TOPK, DEVICE
+from configs.model_config import DEFAULT_TOPK, DEVICE, ANN_SEARCH_THREADS
+from src.retrieval.exact_search import BlockwiseExactSearch
 
 
 class Retriever:
     def __init__(
         self,
-        corpus: List[str],
-        corpus_emb: np.ndarray,
+        corpus: Sequence[str],
+        corpus_embs: Mapping[str, np.ndarray],
         ann_idxs: Dict[str, Index],
         top_k: int = DEFAULT_TOPK,
         device: str = DEVICE,
+        ann_threads: int = ANN_SEARCH_THREADS,
     ):
         """
         Wrap exact (dot-product) and ANN retrieval over a text corpus.
 
         Args:
-            corpus:         list of passages (strings)
-            corpus_emb:     numpy array of shape (N, D) with normalized embeddings
+            corpus:         passages by id (PassageStore or list of strings)
+            corpus_embs:    dict mapping model name → (N, D) normalized corpus
+                            embeddings; memmaps are scanned in place, never copied
             ann_idxs:       dict mapping model name → Usearch Index
             top_k:          number of results to return
             device:         torch device (e.g., 'cpu' or 'cuda')
+            ann_threads:    usearch threads per ANN query batch
         """
         self.corpus = corpus
         self.top_k = top_k
         self.device = device
 
-        self.corpus_T = torch.tensor(corpus_emb, dtype=torch.float32, device=device)
+        self.corpus_embs = corpus_embs
         self.ann_idxs = ann_idxs
+        self.ann_threads = ann_threads
 
-    def _exact(self, q_emb: np.ndarray) -> List[List[str]]:
+    def _exact_ids(self, model: str, q_emb: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
         """
-        Compute exact retrieval by dot-product similarity.
+        Exact retrieval by dot-product similarity, streamed over the
+        model's corpus embeddings block by block.
 
         Args:
+            model: model name key into self.corpus_embs
             q_emb: numpy array (B, D) of query embeddings
 
         Returns:
-            List of top_k passages for each query.
+            (ids int64 (B, top_k), scores float32 (B, top_k)), best first.
         """
-        qT = torch.tensor(q_emb, dtype=torch.float32, device=self.device)
-        with torch.no_grad():
-            sim = qT @ self.corpus_T.T
-            _, idxs = sim.topk(self.top_k, dim=1)
-        
-        return [[self.corpus[i] for i in row] for row in idxs.cpu().numpy()]
-
-    def _ann(self, model: str, q_emb: np.ndarray) -> List[List[str]]:
+        exact = BlockwiseExactSearch(self.corpus_embs[model], device=self.device)
+        return exact.search(q_emb, self.top_k)
+
+    def _ann_ids(self, model: str, q_emb: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
         """
-        Perform approximate nearest neighbor search using Usearch.
+        Approximate nearest neighbor search using Usearch, read straight
+        from the result arrays.
 
         Args:
             model: model name key into self.ann_idxs
             q_emb: numpy array (B, D) of query embeddings
 
         Returns:
-            List of top_k passages per query via ANN index.
+            (ids int64 (B, top_k), scores float32 (B, top_k)). Scores are
+            inner products (1 - distance); slots past a row's hit count,
+            which usearch leaves uninitialised, get id -1 and score 0.
+        """
+        q = np.ascontiguousarray(np.atleast_2d(q_emb), dtype=np.float32)
+        hits = self.ann_idxs[model].search(q, self.top_k, threads=self.ann_threads)
+        keys, dists = hits.keys, hits.distances
+        if not hasattr(hits, "counts"):
+            # a single query comes back as Matches, trimmed to its hits
+            counts = np.array([len(keys)])
+            keys = np.pad(keys, (0, self.top_k - len(keys)))[None]
+            dists = np.pad(dists, (0, self.top_k - len(dists)))[None]
+        else:
+            counts = hits.counts
+        found = np.arange(self.top_k) < counts[:, None]
+        ids = np.where(found, keys.astype(np.int64), -1)
+        scores = np.where(found, 1.0 - dists, 0.0).astype(np.float32)
+        return ids, scores
+
+    def passages(self, ids: np.ndarray) -> "LazyPassages":
+        """
+        Lazy passage-text view of an id matrix from `retrieve_ids`.
+        """
+        return LazyPassages(self.corpus, ids)
+
+    def retrieve_ids(self, model: str, q_emb: np.ndarray) -> Dict[str, Tuple[np.ndarray, np.ndarray]]:
+        """
+        Exact and ANN top_k as passage ids and inner-product scores;
+        no passage text is touched.
+
+        Returns:
+            {"exact": (ids, scores), "ann": (ids, scores)}
         """
-        hits = self.ann_idxs[model].search(q_emb, self.top_k, threads=1)
-        return [[self.corpus[int(h.key)] for h in row] for row in hits]
+        return {
+            "exact": self._exact_ids(model, q_emb),
+            "ann":   self._ann_ids(model, q_emb),
+        }
 
-    def retrieve(self, model: str, q_emb: np.ndarray) -> Dict[str, List[List[str]]]:
+    def retrieve(self, model: str, q_emb: np.ndarray) -> Dict[str, "LazyPassages"]:
         """
-        Return both exact and ANN retrieval results.
+        Return both exact and ANN retrieval results as passages.
 
         Args:
-            model: model name for ANN search
+            model: model name for exact and ANN search
             q_emb: numpy array of query embeddings
 
         Returns:
@@ -78,8 +114,28 @@ class Retriever:
               "exact": [[passage, ...], ...],
               "ann":   [[passage, ...], ...]
             }
+            Rows are looked up in the corpus only when indexed.
         """
-        return {
-            "exact": self._exact(q_emb),
-            "ann":   self._ann(model, q_emb),
-        }
+        return {name: self.passages(ids) for name, (ids, _) in self.retrieve_ids(model, q_emb).items()}
+
+
+class LazyPassages(Sequence[List[str]]):
+    """
+    Rows of passage text for a (B, K) id matrix, resolved against the
+    corpus on access; ids of -1 (missing ANN hits) are skipped.
+    """
+    def __init__(self, corpus: Sequence[str], ids: np.ndarray):
+        self.corpus = corpus
+        self.ids    = ids
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(len(self))[i]]
+        row = self.ids[i]
+        row = row[row >= 0]
+        if hasattr(self.corpus, "take"):
+            return self.corpus.take(row)
+        return [self.corpus[j] for j in row]
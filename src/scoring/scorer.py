@@ -13,7 +13,7 @@ from typing import Any, Optional, List, Tuple, Dict
 from openai import OpenAIError
 from openai import OpenAI as OpenAIClient
 
-from configs.path_config import LABEL_POOL_DIR, OUTPUT_QRELS_DIR
+from configs.path_config import EMBED_DEDUP_ROOT, LABEL_POOL_DIR, OUTPUT_QRELS_DIR
 from configs.gen_config import (
     MODEL_NAME,
     MAX_RETRIES,
@@ -25,6 +25,7 @@ from configs.gen_config import (
 )
  
 from src.query.client import client  
+from src.corpus.manager import CorpusManager
 from src.scoring.raters.base import BaseRater
 from src.scoring.raters.phase4_rater  import Phase4Rater
 from src.scoring.raters.cot_rater     import ChainOfThoughtRater
@@ -81,6 +82,11 @@ def process_part(
     results = load_json(output_file, [])
     done_pairs = {(r.get("original_query"), r.get("passage")) for r in results}
 
+    # label pools hold passage ids; resolve just this part's against the
+    # store they were built from (opened read-only: parts run in parallel)
+    ids = sorted({p for item in items for p in item.get("label_pool", []) if isinstance(p, int)})
+    text = dict(zip(ids, CorpusManager(EMBED_DEDUP_ROOT).open().take(ids))) if ids else {}
+
     to_rate: List[Tuple[str, str]] = []
     for item in items:
         q = item.get("user_query")
@@ -88,6 +94,7 @@ def process_part(
         if not q or not isinstance(pool, list):
             continue
         for p in pool:
+            p = text[p] if isinstance(p, int) else p
             if (q, p) not in done_pairs:
                 to_rate.append((q, p))
 
@@ -150,7 +157,7 @@ def main():
     parser.add_argument("--part_index",  type=int, required=True)
     parser.add_argument(
         "--input_dir",  default=str(LABEL_POOL_DIR),
-        help="Directory of label_pool JSON files"
+        help="Directory of label_pool JSON files (passage ids or text)"
     )
     parser.add_argument(
         "--output_dir", default=str(OUTPUT_QRELS_DIR),
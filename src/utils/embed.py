@@ -1,11 +1,20 @@
 # src/utils/embed.py
 
+import copy
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
 import numpy as np
 import torch
 import torch.nn.functional as F
 from torch import Tensor
 from tqdm import tqdm
-from typing import List, Tuple
+from typing import Dict, List, Tuple
+
+from configs.model_config import EMBED_GROW_AFTER, EMBED_MAX_SCALE
 
 def cls_pool(hidden_states: Tensor, mask: Tensor) -> Tensor:
     return hidden_states[:, 0]
@@ -30,6 +39,139 @@ POOL_FN = {
     "mean": mean_pool,
 }
 
+def _forward(model, tok, pool_fn, dtype: torch.dtype) -> Tensor:
+    with torch.no_grad():
+        out = model(**tok)
+    hidden = out.last_hidden_state if hasattr(out, "last_hidden_state") else out[0]
+    emb = pool_fn(hidden, tok["attention_mask"])
+    return F.normalize(emb, p=2, dim=1).to(dtype)
+
+def _encode(model, batch_texts: List[str], max_len: int, device: str, dtype: torch.dtype) -> Tensor:
+    arr = model.encode(batch_texts, max_length=max_len)
+    t = arr if isinstance(arr, torch.Tensor) else torch.from_numpy(arr)
+    emb = t.to(device).to(dtype)
+    return F.normalize(emb, p=2, dim=1)
+
+def length_batches(lengths: np.ndarray, token_budget: int) -> List[np.ndarray]:
+    """
+    Group item indices into batches of similar length, longest first,
+    so that each padded batch (items × longest item) stays within
+    `token_budget` tokens; an item longer than the budget goes alone.
+    """
+    order = np.argsort(-lengths, kind="stable")
+    batches, i = [], 0
+    while i < len(order):
+        size = max(1, token_budget // max(1, int(lengths[order[i]])))
+        batches.append(order[i:i + size])
+        i += size
+    return batches
+
+_PRETOKENIZE_CHUNK = 1024
+
+class EmbedTimer:
+    """
+    Thread-safe counters for one or more embed_texts calls:
+      tokenize_s  tokenizer time, summed over worker threads
+      wait_s      time the model loop sat waiting for a tokenized batch
+      model_s     transfer + forward + copy back of the embeddings
+      texts, tokens, padded
+    """
+    def __init__(self):
+        self.totals: Dict[str, float] = {}
+        self.lock = threading.Lock()
+
+    def add(self, **amounts: float) -> None:
+        with self.lock:
+            for k, v in amounts.items():
+                self.totals[k] = self.totals.get(k, 0) + v
+
+    @contextmanager
+    def time(self, key: str):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(**{key: time.perf_counter() - t0})
+
+    def summary(self) -> str:
+        t = self.totals
+        return (f"tokenize {t.get('tokenize_s', 0):.1f}s (waited {t.get('wait_s', 0):.1f}s)  "
+                f"model {t.get('model_s', 0):.1f}s  "
+                f"{t.get('tokens', 0) / max(t.get('model_s', 0), 1e-9):,.0f} tokens/s in model")
+
+class PinnedStager:
+    """
+    Moves tokenized batches to the device through page-locked host buffers
+    that are reused across batches (grown when a batch is larger), so the
+    copy can be issued with non_blocking=True. Plain .to() off CUDA.
+
+    A CUDA event is recorded after each buffer's copy and waited on before
+    the buffer is written again, so a batch whose forward failed (e.g. an
+    OOM retried at a smaller size) cannot have its in-flight copy
+    overwritten by the retry.
+    """
+    def __init__(self, device: str):
+        self.device = device
+        self.bufs:   Dict[str, Tensor] = {}
+        self.events: Dict[str, "torch.cuda.Event"] = {}
+
+    def __call__(self, tok) -> Dict[str, Tensor]:
+        if not self.device.startswith("cuda"):
+            return {k: v.to(self.device) for k, v in tok.items()}
+        out = {}
+        for k, v in tok.items():
+            if k in self.events:
+                self.events.pop(k).synchronize()
+            buf = self.bufs.get(k)
+            if buf is None or buf.numel() < v.numel() or buf.dtype != v.dtype:
+                buf = self.bufs[k] = torch.empty(v.numel(), dtype=v.dtype).pin_memory()
+            staged = buf[:v.numel()].view(v.shape)
+            staged.copy_(v)
+            out[k] = staged.to(self.device, non_blocking=True)
+            event = self.events[k] = torch.cuda.Event()
+            event.record()
+        return out
+
+def is_oom(e: BaseException) -> bool:
+    """
+    True for an allocation failure (CUDA out of memory or a failed host
+    allocation), as opposed to an error in the input itself.
+    """
+    if isinstance(e, (torch.cuda.OutOfMemoryError, MemoryError)):
+        return True
+    msg = str(e).lower()
+    return "out of memory" in msg or "can't allocate memory" in msg
+
+class AdaptiveLimit:
+    """
+    Batch limit (texts, or padded tokens in length-aware mode) that is
+    halved on an allocation failure and grown again after `grow_after`
+    clean batches in a row, up to `max_scale` × its starting value.
+    Growth stays below the smallest limit that has failed: it doubles
+    while that is out of reach and then steps halfway towards it, so the
+    limit settles just under the largest size that fits instead of
+    running out of memory again every `grow_after` batches.
+    """
+    def __init__(self, start: int, grow_after: int = EMBED_GROW_AFTER, max_scale: int = EMBED_MAX_SCALE):
+        self.value      = start
+        self.cap        = start * max_scale
+        self.grow_after = grow_after
+        self.streak     = 0
+
+    def shrink(self) -> None:
+        self.cap    = min(self.cap, self.value - 1)
+        self.value  = max(1, self.value // 2)
+        self.streak = 0
+
+    def success(self) -> None:
+        self.streak += 1
+        if self.streak >= self.grow_after and self.value < self.cap:
+            grown = self.value * 2
+            if grown > self.cap:
+                grown = (self.value + self.cap + 1) // 2
+            self.value  = min(self.cap, grown)
+            self.streak = 0
+
 def embed_texts(
     model,
     tokenizer,
@@ -40,7 +182,11 @@ def embed_texts(
     device: str,
     dtype: torch.dtype,
     use_encode: bool = False,
-    desc: str = "embed"
+    desc: str = "embed",
+    token_budget: int | None = None,
+    adaptive: bool = False,
+    prefetch: int = 0,
+    stats: "EmbedTimer | None" = None,
 ) -> Tuple[np.ndarray, List[int]]:
     """
     Batch-encode a list of texts into L2-normalized embeddings.
@@ -56,51 +202,145 @@ def embed_texts(
       dtype:      torch dtype for the output embeddings
       use_encode: if True, call model.encode() directly
       desc:       tqdm progress bar description
+      token_budget: if set, length-aware mode: pre-tokenize everything,
+                  sort by length and form batches of at most this many
+                  padded tokens instead of `batch_size` texts in input order
+      adaptive:   if True, an out-of-memory batch is retried with the limit
+                  (batch_size or token_budget) halved, the limit grows back
+                  after a run of clean batches, and any other failing batch
+                  is bisected down to the single texts that cannot be
+                  embedded; otherwise a failing batch is skipped whole
+      prefetch:   if > 0, a pool of this many threads tokenizes the next
+                  `prefetch` batches while the current one runs through the
+                  model; 0 tokenizes each batch inline
+      stats:      EmbedTimer to accumulate tokenization / model time into
 
     Returns:
       embs:       numpy array of shape (num_valid, hidden_dim)
-      valid_idxs: list of indices for texts successfully embedded
+      valid_idxs: ascending indices of the texts embedded; embs[j] is
+                  texts[valid_idxs[j]]
     """
     pool_fn = POOL_FN[pool_tag]
     total = len(texts)
-    all_embs: List[np.ndarray] = []
-    valid_idxs: List[int] = []
+    encode = use_encode and hasattr(model, "encode")
+    timer = EmbedTimer() if stats is None else stats
+    workers = ThreadPoolExecutor(prefetch) if prefetch and not encode else None
+    stage = PinnedStager(device)
 
-    for start in tqdm(range(0, total, batch_size), desc=desc, unit="batch"):
-        end = min(start + batch_size, total)
-        batch_texts = texts[start:end]
-        try:
-            if use_encode and hasattr(model, "encode"):
-                arr = model.encode(batch_texts, max_length=max_len)
-                t = arr if isinstance(arr, torch.Tensor) else torch.from_numpy(arr)
-                emb = t.to(device).to(dtype)
-                emb = F.normalize(emb, p=2, dim=1)
+    # fast tokenizers are not safe to share across threads: one copy per worker
+    local = threading.local()
+    def tokenizer_here():
+        if workers is None or threading.current_thread() is threading.main_thread():
+            return tokenizer
+        if not hasattr(local, "tok"):
+            local.tok = copy.deepcopy(tokenizer)
+        return local.tok
+
+    if token_budget:
+        with timer.time("tokenize_s"), timer.time("wait_s"):
+            chunks = [list(texts[i:i + _PRETOKENIZE_CHUNK]) for i in range(0, total, _PRETOKENIZE_CHUNK)]
+            pretok = lambda chunk: tokenizer_here()(chunk, max_length=max_len, truncation=True)
+            encs = list(workers.map(pretok, chunks)) if workers else [pretok(c) for c in chunks]
+            enc = {k: [x for e in encs for x in e[k]] for k in (encs[0].keys() if encs else ())}
+        lengths = np.fromiter(map(len, enc.get("input_ids", [])), dtype=np.int64, count=total)
+        order = np.argsort(-lengths, kind="stable")
+        size_at = lambda pos, limit: max(1, limit // max(1, int(lengths[order[pos]])))
+    else:
+        order = np.arange(total)
+        size_at = lambda pos, limit: limit
+
+    def prepare(batch: np.ndarray):
+        # producer side: runs on the worker pool when prefetching
+        if encode:
+            return [texts[i] for i in batch]
+        with timer.time("tokenize_s"):
+            if token_budget:
+                tok = tokenizer_here().pad(
+                    {k: [v[i] for i in batch] for k, v in enc.items()}, padding=True, return_tensors="pt"
+                )
             else:
-                tok = tokenizer(
-                    batch_texts,
+                tok = tokenizer_here()(
+                    [texts[i] for i in batch],
                     max_length=max_len,
                     truncation=True,
                     padding=True,
                     return_tensors="pt"
-                ).to(device)
-                with torch.no_grad():
-                    out = model(**tok)
-                hidden = out.last_hidden_state if hasattr(out, "last_hidden_state") else out[0]
-                emb = pool_fn(hidden, tok["attention_mask"])
-                emb = F.normalize(emb, p=2, dim=1).to(dtype)
+                )
+        timer.add(tokens=int(tok["attention_mask"].sum()), padded=tok["attention_mask"].numel())
+        return tok
 
-            emb_np = emb.cpu().numpy()
-            all_embs.append(emb_np)
-            valid_idxs.extend(range(start, end))
+    def forward(prepared) -> np.ndarray:
+        with timer.time("model_s"):
+            if encode:
+                emb = _encode(model, prepared, max_len, device, dtype)
+            else:
+                emb = _forward(model, stage(prepared), pool_fn, dtype)
+            return emb.cpu().numpy()
 
+    def bisect(batch: np.ndarray) -> None:
+        # isolate the items that fail on their own; the rest are kept
+        try:
+            parts.append(forward(prepare(batch)))
+            done.append(batch)
         except Exception as e:
-            print(f"skip batch {start}-{end}: {e}")
-            continue
+            if len(batch) == 1:
+                print(f"[{desc}] unembeddable text {int(batch[0])}: {e}")
+                return
+            if is_oom(e) and device.startswith("cuda"):
+                torch.cuda.empty_cache()
+            half = len(batch) // 2
+            bisect(batch[:half])
+            bisect(batch[half:])
 
-    if all_embs:
-        embs = np.concatenate(all_embs, axis=0)
-    else:
+    parts: List[np.ndarray] = []
+    done:  List[np.ndarray] = []
+    limit = AdaptiveLimit(token_budget or batch_size)
+    ahead: deque = deque()      # (batch, future) planned and being tokenized
+    pos = planned = 0
+    try:
+        with tqdm(total=total, desc=desc, unit="text") as bar:
+            while pos < total:
+                while planned < total and len(ahead) < max(1, prefetch):
+                    batch = order[planned:planned + size_at(planned, limit.value)]
+                    ahead.append((batch, workers.submit(prepare, batch) if workers else None))
+                    planned += len(batch)
+                batch, fut = ahead.popleft()
+                try:
+                    with timer.time("wait_s"):
+                        prepared = fut.result() if fut else prepare(batch)
+                    parts.append(forward(prepared))
+                    done.append(batch)
+                    if adaptive:
+                        limit.success()
+                except Exception as e:
+                    if not adaptive:
+                        print(f"skip batch of {len(batch)} texts at {pos}: {e}")
+                    elif is_oom(e) and len(batch) > 1:
+                        if device.startswith("cuda"):
+                            torch.cuda.empty_cache()
+                        limit.shrink()
+                        print(f"[{desc}] out of memory on {len(batch)} texts, limit now {limit.value}")
+                        # re-plan from here with the smaller limit
+                        for _, f in ahead:
+                            if f:
+                                f.cancel()
+                        ahead.clear()
+                        planned = pos
+                        continue
+                    else:
+                        bisect(batch)
+                pos += len(batch)
+                bar.update(len(batch))
+    finally:
+        if workers:
+            workers.shutdown(cancel_futures=True)
+    timer.add(texts=total)
+
+    if not done:
         hidden_size = model.config.hidden_size if hasattr(model, "config") and hasattr(model.config, "hidden_size") else 0
-        embs = np.empty((0, hidden_size), dtype=np.float32)
+        return np.empty((0, hidden_size), dtype=np.float32), []
 
-    return embs, valid_idxs
+    # back to input order
+    idx = np.concatenate(done)
+    back = np.argsort(idx, kind="stable")
+    return np.concatenate(parts, axis=0)[back], idx[back].tolist()
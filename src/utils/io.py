@@ -1,11 +1,12 @@
 # src/utils/io.py
 
 import json
-import glob
 import os
 from pathlib import Path
 from typing import Any, List, Tuple
 
+from src.corpus.passage_store import PassageStore
+
 
 def load_json(path: str, default: Any = None) -> Any:
     try:
@@ -21,34 +22,26 @@ def dump_json(path: str, obj: Any, indent: int = 2) -> None:
         json.dump(obj, f, ensure_ascii=False, indent=indent)
 
 
-def build_ordered_corpus(corpus_dir: str, out_fp: str) -> List[str]:
+def build_ordered_corpus(corpus_dir: str, out_dir: str, pattern: str = "deduped_*.json") -> PassageStore:
+    """
+    Read the chunk files matching `pattern` under `corpus_dir`, in name
+    order, and write their non-empty passages as a PassageStore under
+    `out_dir`. Returns the store.
+    """
+    files = sorted(Path(corpus_dir).glob(pattern))
+    if not files:
+        raise FileNotFoundError(f"no {pattern} chunk files in {corpus_dir}")
+    return PassageStore.build(files, out_dir)
+
+
+def load_ordered_corpus(path: str) -> PassageStore | List[str]:
     """
-    Read all .json files under `corpus_dir`, flatten their lists of strings,
-    filter out empty lines, and write the ordered list to `out_fp`.
-    Returns the list of passages.
+    Open the ordered corpus at `path`: a PassageStore directory, or a
+    legacy ordered_corpus.json list of strings.
     """
-    files = sorted(glob.glob(os.path.join(corpus_dir, "*.json")))
-    corpus: List[str] = []
-    for fp in files:
-        try:
-            arr = json.load(open(fp, encoding="utf-8"))
-        except Exception:
-            continue
-        for txt in arr:
-            line = txt.strip()
-            if line:
-                corpus.append(line)
-
-    Path(out_fp).parent.mkdir(parents=True, exist_ok=True)
-    with open(out_fp, "w", encoding="utf-8") as wf:
-        json.dump(corpus, wf, ensure_ascii=False, indent=2)
-    print(f"Built ordered corpus at {out_fp} with {len(corpus)} passages.")
-
-    return corpus
-
-
-def load_ordered_corpus(corpus_json: str) -> List[str]:
-    return json.load(open(corpus_json, encoding="utf-8"))
+    if Path(path).is_dir():
+        return PassageStore(path)
+    return json.load(open(path, encoding="utf-8"))
 
 
 def load_test_file(path: str) -> Tuple[List[dict], List[str]]: